@@ -0,0 +1,325 @@
+from random import Random
+from typing import Tuple, Dict, Sequence
+
+# Pure integer helpers on the bitboards, no Python objects and no pygame in here.
+# A square (x, y) maps to bit x * 8 + y and a piece is its bitboard index,
+# color * 6 + type with the types in `PIECE_NAMES` order, white first.
+
+PIECE_NAMES: Tuple[str, ...] = ("king", "queen", "rook", "bishop", "knight", "pawn")
+KING, QUEEN, ROOK, BISHOP, KNIGHT, PAWN = range(6)
+
+# Material value of every bitboard index, white counts positive.
+PIECE_VALUE_TABLE: Tuple[int, ...] = (1000, 9, 5, 3, 3, 1, -1000, -9, -5, -3, -3, -1)
+
+ROOK_DIRS: Tuple[Tuple[int, int], ...] = ((0, -1), (0, 1), (-1, 0), (1, 0))
+BISHOP_DIRS: Tuple[Tuple[int, int], ...] = ((1, -1), (1, 1), (-1, -1), (-1, 1))
+
+
+def _step_attacks(sq: int, deltas: Sequence[Tuple[int, int]]) -> int:
+    x, y = divmod(sq, 8)
+    attacks = 0
+    for dx, dy in deltas:
+        if 0 <= x + dx < 8 and 0 <= y + dy < 8:
+            attacks |= 1 << ((x + dx) * 8 + y + dy)
+
+    return attacks
+
+
+def _ray_attacks(sq: int, occ: int, dirs: Sequence[Tuple[int, int]]) -> int:
+    """Walk every direction until the edge of the board or the first blocker (included)."""
+    x, y = divmod(sq, 8)
+    attacks = 0
+    for dx, dy in dirs:
+        ex, ey = x + dx, y + dy
+        while 0 <= ex < 8 and 0 <= ey < 8:
+            mask = 1 << (ex * 8 + ey)
+            attacks |= mask
+            if occ & mask:
+                break
+            ex, ey = ex + dx, ey + dy
+
+    return attacks
+
+
+def _ray_mask(sq: int, dirs: Sequence[Tuple[int, int]]) -> int:
+    """The squares whose occupancy changes the slider attacks, the edge squares never do."""
+    x, y = divmod(sq, 8)
+    mask = 0
+    for dx, dy in dirs:
+        ex, ey = x + dx, y + dy
+        while 0 <= ex + dx < 8 and 0 <= ey + dy < 8:
+            mask |= 1 << (ex * 8 + ey)
+            ex, ey = ex + dx, ey + dy
+
+    return mask
+
+
+KNIGHT_ATTACKS: Tuple[int, ...] = tuple(
+    _step_attacks(sq, ((1, 2), (1, -2), (-1, 2), (-1, -2), (2, 1), (2, -1), (-2, 1), (-2, -1)))
+    for sq in range(64)
+)
+KING_ATTACKS: Tuple[int, ...] = tuple(
+    _step_attacks(sq, ROOK_DIRS + BISHOP_DIRS) for sq in range(64)
+)
+# White pawns move towards y = 7, black pawns towards y = 0.
+PAWN_ATTACKS_W: Tuple[int, ...] = tuple(_step_attacks(sq, ((1, 1), (-1, 1))) for sq in range(64))
+PAWN_ATTACKS_B: Tuple[int, ...] = tuple(_step_attacks(sq, ((1, -1), (-1, -1))) for sq in range(64))
+
+ROOK_MASKS: Tuple[int, ...] = tuple(_ray_mask(sq, ROOK_DIRS) for sq in range(64))
+BISHOP_MASKS: Tuple[int, ...] = tuple(_ray_mask(sq, BISHOP_DIRS) for sq in range(64))
+
+# Slider attacks keyed on (square, relevant occupancy). The dict does the job of the
+# magic multiplication and the tables get filled the first time an occupancy is seen.
+_ROOK_TABLE: Tuple[Dict[int, int], ...] = tuple({} for _ in range(64))
+_BISHOP_TABLE: Tuple[Dict[int, int], ...] = tuple({} for _ in range(64))
+
+
+def rook_attacks(sq: int, occ: int) -> int:
+    key = occ & ROOK_MASKS[sq]
+    attacks = _ROOK_TABLE[sq].get(key)
+    if attacks is None:
+        attacks = _ROOK_TABLE[sq][key] = _ray_attacks(sq, key, ROOK_DIRS)
+
+    return attacks
+
+
+def bishop_attacks(sq: int, occ: int) -> int:
+    key = occ & BISHOP_MASKS[sq]
+    attacks = _BISHOP_TABLE[sq].get(key)
+    if attacks is None:
+        attacks = _BISHOP_TABLE[sq][key] = _ray_attacks(sq, key, BISHOP_DIRS)
+
+    return attacks
+
+
+def queen_attacks(sq: int, occ: int) -> int:
+    return rook_attacks(sq, occ) | bishop_attacks(sq, occ)
+
+
+def piece_targets(sq: int, idx: int, occ_w: int, occ_b: int) -> int:
+    """
+    Find all the squares a piece can move to.
+
+    Parameters
+    ----------
+    sq      : int
+        The square of the piece.
+    idx     : int
+        The bitboard index of the piece.
+    occ_w   : int
+        The occupancy of the white pieces.
+    occ_b   : int
+        The occupancy of the black pieces.
+
+    Returns
+    -------
+    int
+        A bitboard with a set bit for every empty or enemy square the piece reaches.
+    """
+    if idx < 6:
+        own, enemy, ptype = occ_w, occ_b, idx
+    else:
+        own, enemy, ptype = occ_b, occ_w, idx - 6
+    occ = own | enemy
+
+    if ptype == KING:
+        return KING_ATTACKS[sq] & ~own
+    elif ptype == KNIGHT:
+        return KNIGHT_ATTACKS[sq] & ~own
+    elif ptype == ROOK:
+        return rook_attacks(sq, occ) & ~own
+    elif ptype == BISHOP:
+        return bishop_attacks(sq, occ) & ~own
+    elif ptype == QUEEN:
+        return queen_attacks(sq, occ) & ~own
+
+    y = sq & 7
+    if idx < 6:
+        targets = PAWN_ATTACKS_W[sq] & enemy
+        if y < 7 and not (occ >> (sq + 1)) & 1:
+            targets |= 1 << (sq + 1)
+            if y == 1 and not (occ >> (sq + 2)) & 1:
+                targets |= 1 << (sq + 2)
+    else:
+        targets = PAWN_ATTACKS_B[sq] & enemy
+        if y > 0 and not (occ >> (sq - 1)) & 1:
+            targets |= 1 << (sq - 1)
+            if y == 6 and not (occ >> (sq - 2)) & 1:
+                targets |= 1 << (sq - 2)
+
+    return targets
+
+
+def is_attacked(sq: int, first: int, bb: Sequence[int], occ: int) -> bool:
+    """
+    Whether a piece of the color starting at bitboard index `first` attacks the square.
+    Every piece type is looked up backwards, from the square to where an attacker would stand.
+    """
+    pawn_attacks = PAWN_ATTACKS_B if first == 0 else PAWN_ATTACKS_W
+    rooks = bb[first + ROOK] | bb[first + QUEEN]
+    bishops = bb[first + BISHOP] | bb[first + QUEEN]
+
+    return bool(
+        KNIGHT_ATTACKS[sq] & bb[first + KNIGHT]
+        or KING_ATTACKS[sq] & bb[first + KING]
+        or pawn_attacks[sq] & bb[first + PAWN]
+        or rooks and rook_attacks(sq, occ) & rooks
+        or bishops and bishop_attacks(sq, occ) & bishops
+    )
+
+
+def _row_mask(y: int) -> int:
+    """Every square (x, y) of one row."""
+    return sum(1 << (x * 8 + y) for x in range(8))
+
+
+_ROW_0, _ROW_2, _ROW_5, _ROW_7 = _row_mask(0), _row_mask(2), _row_mask(5), _row_mask(7)
+
+
+# Where the pawn of a `pawn_move_sets` target came from, as an offset from the target:
+# single push, double push, capture towards x + 1 and capture towards x - 1.
+PAWN_FROM_OFFSETS_W: Tuple[int, int, int, int] = (-1, -2, -9, 7)
+PAWN_FROM_OFFSETS_B: Tuple[int, int, int, int] = (1, 2, -7, 9)
+
+
+def pawn_move_sets(pawns: int, white: bool, occ: int, enemy: int) -> Tuple[int, int, int, int]:
+    """
+    The targets of all the pawns of one color at once (SWAR), one step forward is a shift
+    by 1 towards y = 7 for white and towards y = 0 for black, a capture a shift by 9 or 7.
+    A shift from the last row would wrap into the next column (or past bit 63), so the pawns
+    on it are masked out before shifting.
+
+    Returns
+    -------
+    Tuple[int, int, int, int]
+        The single pushes, double pushes, captures towards x + 1 and captures towards x - 1,
+        see `PAWN_FROM_OFFSETS_W` and `PAWN_FROM_OFFSETS_B` for the squares they came from.
+    """
+    if white:
+        forward = pawns & ~_ROW_7
+        single = (forward << 1) & ~occ
+        double = ((single & _ROW_2) << 1) & ~occ
+        return single, double, (forward << 9) & enemy, (forward >> 7) & enemy
+
+    forward = pawns & ~_ROW_0
+    single = (forward >> 1) & ~occ
+    double = ((single & _ROW_5) >> 1) & ~occ
+    return single, double, (forward << 7) & enemy, (forward >> 9) & enemy
+
+
+def mobility(bb: Sequence[int], first: int, occ_w: int, occ_b: int) -> int:
+    """
+    Count the distinct squares the pieces of one color can move to.
+    The attacks of every piece type are OR-ed together straight from the tables,
+    the pawns of the color are moved all at once with shifts.
+    It runs at every leaf of the search, so the square loops and the slider
+    table lookups are written out inline.
+
+    Parameters
+    ----------
+    bb      : Sequence[int]
+        The 12 bitboards.
+    first   : int
+        0 for white and 6 for black, the index of the color's first bitboard.
+    occ_w   : int
+        The occupancy of the white pieces.
+    occ_b   : int
+        The occupancy of the black pieces.
+
+    Returns
+    -------
+    int
+        The number of squares reached, a square reached by two pieces counts once.
+    """
+    if first == 0:
+        own, enemy = occ_w, occ_b
+    else:
+        own, enemy = occ_b, occ_w
+    occ = own | enemy
+
+    targets = 0
+    pieces = bb[first + KING] | bb[first + KNIGHT]
+    knights = bb[first + KNIGHT]
+    while pieces:
+        lsb = pieces & -pieces
+        pieces ^= lsb
+        sq = lsb.bit_length() - 1
+        targets |= KNIGHT_ATTACKS[sq] if knights & lsb else KING_ATTACKS[sq]
+
+    queens = bb[first + QUEEN]
+    pieces = bb[first + ROOK] | queens
+    while pieces:
+        lsb = pieces & -pieces
+        pieces ^= lsb
+        sq = lsb.bit_length() - 1
+        attacks = _ROOK_TABLE[sq].get(occ & ROOK_MASKS[sq])
+        targets |= rook_attacks(sq, occ) if attacks is None else attacks
+
+    pieces = bb[first + BISHOP] | queens
+    while pieces:
+        lsb = pieces & -pieces
+        pieces ^= lsb
+        sq = lsb.bit_length() - 1
+        attacks = _BISHOP_TABLE[sq].get(occ & BISHOP_MASKS[sq])
+        targets |= bishop_attacks(sq, occ) if attacks is None else attacks
+    targets &= ~own
+
+    single, double, captures_right, captures_left = pawn_move_sets(
+        bb[first + PAWN], first == 0, occ, enemy
+    )
+    targets |= single | double | captures_right | captures_left
+
+    return targets.bit_count()
+
+
+def material(bb: Sequence[int]) -> int:
+    """The material balance of the 12 bitboards, positive when white is ahead."""
+    score = 0
+    for value, pieces in zip(PIECE_VALUE_TABLE, bb):
+        score += value * pieces.bit_count()
+
+    return score
+
+
+# Zobrist keys, one random 64 bit int per (bitboard index, square) plus one for black to move.
+# Seeded so a hash means the same position on every run.
+_rng = Random(0x5EED)
+ZOBRIST: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(_rng.getrandbits(64) for _ in range(64)) for _ in range(12)
+)
+ZOBRIST_SIDE: int = _rng.getrandbits(64)
+del _rng
+
+
+def zobrist_hash(bb: Sequence[int], player: str) -> int:
+    """Hash the position from scratch, moves keep it up to date by XOR-ing the keys they touch."""
+    h = ZOBRIST_SIDE if player == "b" else 0
+    for idx, pieces in enumerate(bb):
+        keys = ZOBRIST[idx]
+        while pieces:
+            lsb = pieces & -pieces
+            pieces ^= lsb
+            h ^= keys[lsb.bit_length() - 1]
+
+    return h
+
+
+# The keys of the mirrored position: the rows flipped (y -> 7 - y is sq ^ 7),
+# the colors swapped and the other player to move. The evaluation is antisymmetric,
+# so the mirrored position is worth minus the position.
+ZOBRIST_MIRROR: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(ZOBRIST[(idx + 6) % 12][sq ^ 7] for sq in range(64)) for idx in range(12)
+)
+
+
+def mirror_hash(bb: Sequence[int], player: str) -> int:
+    """The Zobrist hash of the mirrored position, see `ZOBRIST_MIRROR`."""
+    h = ZOBRIST_SIDE if player == "w" else 0
+    for idx, pieces in enumerate(bb):
+        keys = ZOBRIST_MIRROR[idx]
+        while pieces:
+            lsb = pieces & -pieces
+            pieces ^= lsb
+            h ^= keys[lsb.bit_length() - 1]
+
+    return h
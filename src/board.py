@@ -2,21 +2,161 @@ from __future__ import annotations
 import copy
 import pygame
 from itertools import cycle
+from array import array
+from pathlib import Path
 from collections import deque
 
-from typing import Tuple, List, Optional, Sequence
-from piece import Piece, PieceFactory, MoveFactory
-
-
-def flatten_list(list_: List[List["Block"]]) -> List["Block"]:
-    flattened_list: List["Block"] = []
-    for row in list_:
-        flattened_list.extend(row)
-
-    return flattened_list
+from typing import Tuple, List, Dict, Set, Optional, Sequence
+from piece import Piece, PieceFactory, Move
+from bitboard import (
+    PIECE_NAMES,
+    PIECE_VALUE_TABLE,
+    ZOBRIST,
+    ZOBRIST_SIDE,
+    KING,
+    QUEEN,
+    ROOK,
+    BISHOP,
+    KNIGHT,
+    PAWN,
+    KING_ATTACKS,
+    KNIGHT_ATTACKS,
+    PAWN_FROM_OFFSETS_B,
+    PAWN_FROM_OFFSETS_W,
+    bishop_attacks,
+    queen_attacks,
+    rook_attacks,
+    is_attacked,
+    pawn_move_sets,
+    piece_targets,
+    mobility,
+    material,
+    zobrist_hash,
+)
+
+# Every (team, name) pair gets its own bitboard, white pieces first.
+PIECES: Tuple[Tuple[str, str], ...] = tuple(
+    (team, name) for team in ("w", "b") for name in PIECE_NAMES
+)
+PIECE_IDX: Dict[Tuple[str, str], int] = {piece: i for i, piece in enumerate(PIECES)}
+
+# Piece images decoded once, keyed by their path.
+_IMG_CACHE: Dict[Path, pygame.Surface] = {}
+
+# A played move is packed in one int: from_sq | to_sq << 6 | captured << 12 | moving << 16
+NO_CAPTURE: int = 0xF
+
+# A searched move is packed like a played one with its ordering score on top:
+# from_sq | to_sq << 6 | captured << 12 | moving << 16 | score << 20, so sorting sorts by score.
+SearchMove = int
+# What `Board.make_move` needs to take the move back: (from_sq, to_sq, captured, moving, prev_player).
+UndoInfo = Tuple[int, int, int, int, str]
+# A transposition table entry: (zhash, depth, score, flag, from_sq | to_sq << 6 of the best move).
+TTEntry = Tuple[int, int, int, int, int]
+
+# Hardcoded (row, column) positions for all pieces, the first half of each list is white.
+_INIT_POSITIONS: Dict[str, List[Tuple[int, int]]] = {
+    "king": [(0, 3), (7, 4)],
+    "queen": [(0, 4), (7, 3)],
+    "rook": [(0, 0), (0, 7), (7, 0), (7, 7)],
+    "bishop": [(0, 2), (0, 5), (7, 2), (7, 5)],
+    "knight": [(0, 1), (0, 6), (7, 1), (7, 6)],
+    "pawn": [(i, j) for i in [1, 6] for j in range(8)],
+}
+
+# The starting (name, ind_pos, team) of every piece, ind_pos is (column, row).
+INITIAL_PLACEMENTS: Tuple[Tuple[str, Tuple[int, int], str], ...] = tuple(
+    (name, (y, x), "w" if i < len(positions) // 2 else "b")
+    for name, positions in _INIT_POSITIONS.items()
+    for i, (x, y) in enumerate(positions)
+)
+
+# The checkerboard colors of every block.
+_COLOR_GRID: Tuple[Tuple[Tuple[int, int, int], ...], ...] = tuple(
+    tuple((255, 255, 255) if (i + j) % 2 == 0 else (0, 100, 0) for j in range(8))
+    for i in range(8)
+)
+
+# The piece letters of a serialized board state, see `Board.serialize`.
+_LETTER_TO_NAME: Dict[str, str] = {
+    "K": "king",
+    "Q": "queen",
+    "R": "rook",
+    "b": "bishop",
+    "k": "knight",
+    "P": "pawn",
+}
+
+# The 4 character code of every (bitboard index, square) in a serialized board state.
+_STATE_CODES: Tuple[Tuple[str, ...], ...] = tuple(
+    tuple(
+        team.upper()
+        + next(letter for letter, piece in _LETTER_TO_NAME.items() if piece == name)
+        + f"{sq >> 3}{sq & 7}"
+        for sq in range(64)
+    )
+    for team, name in PIECES
+)
+
+# MVV-LVA capture scores indexed [captured][moving] by bitboard index, the most valuable
+# victim first and for the same victim the least valuable attacker. Quiet moves score 0.
+_ORDER_RANK: Tuple[int, ...] = (6, 5, 4, 3, 2, 1)
+MVV_LVA: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(_ORDER_RANK[captured % 6] * 16 - _ORDER_RANK[moving % 6] for moving in range(12))
+    for captured in range(12)
+)
+
+# Pygame objects can't be deep copied, a copied board shares these read-only render
+# caches (and the search results, like `Board.clone`).
+_SHARED_ON_COPY: Tuple[str, ...] = (
+    "_bg_surface",
+    "_highlight_clicked",
+    "_highlight_poss",
+    "_font",
+    "_text_cache",
+    "transposition_table",
+)
+
+# Heuristic (quiet, capture) scores of a move, used only for ordering the search.
+MOVE_SCORES: Dict[str, Tuple[int, int]] = {
+    "king": (1000, 10000),
+    "queen": (300, 600),
+    "rook": (100, 200),
+    "bishop": (50, 100),
+    "knight": (0, 100),
+    "pawn": (0, 20),
+}
+
+
+def decode_move(move: int) -> Tuple[int, int, int, int]:
+    """
+    Unpack a played or searched move, only needed where the move leaves the search.
+
+    Parameters
+    ----------
+    move    : int
+        The packed move.
+    Returns
+    -------
+    Tuple[int, int, int, int]
+        The from square, to square, captured and moving bitboard indices.
+    """
+    return move & 63, (move >> 6) & 63, (move >> 12) & 0xF, (move >> 16) & 0xF
 
 
 class Block:
+    # 64 of them live as long as the board, no need for a __dict__ each.
+    __slots__ = (
+        "pos",
+        "color",
+        "block_size",
+        "clicked",
+        "clicked_color",
+        "piece",
+        "poss_move",
+        "pg_rect",
+    )
+
     def __init__(
         self,
         pos: Tuple[int, int],
@@ -34,8 +174,6 @@ class Block:
         self.piece: Optional[Piece] = None
 
         self.poss_move: bool = False
-        self.block_clicked: cycle[bool] = cycle([True, False])
-        self.block_p_move: cycle[bool] = cycle([True, False])
 
         # Rect(left, top, width, height) -> Rect
         self.pg_rect = pygame.Rect(
@@ -50,18 +188,15 @@ class Block:
 
     def select_block(self, board: "Board"):
         if not board.game_over:
-            blocks = flatten_list(board.blocks)
-
-            # Reset the click cycle buffer to initial position
-            self.block_clicked = cycle([True, False])
+            # Reset the click state to its initial position
+            self.clicked = False
 
             # Reset the board
-            for block in blocks:
-                block.clicked = False
-                block.poss_move = False
+            board.clear_highlights()
 
-            self.clicked = next(self.block_clicked)
+            self.clicked = not self.clicked
             board.clicked_blocks.append(self)
+            board._dirty_blocks.add(self)
 
             if len(board.clicked_blocks) == 1 and self.piece:
                 """
@@ -78,6 +213,7 @@ class Block:
                 for mv in av_moves:
                     x, y = mv.end_pos
                     board.blocks[x][y].poss_move = True
+                    board._dirty_blocks.add(board.blocks[x][y])
 
             elif len(board.clicked_blocks) == 2:
                 """
@@ -90,27 +226,17 @@ class Block:
                         -> Reset the board (?)
                         -> Clear the clicked blocks cache
                 """
-                # On board change, store the board
-                board.serialize()
-
                 start, end = board.clicked_blocks
                 if start.piece:
                     if board.clicked_blocks[-1] == self:
                         # FIXME: There is a bug here, in the case of not appending a click
                         # (else clause) it think's that you re-pressed the same block.
-                        for block in blocks:
-                            block.clicked = False
-                            block.poss_move = False
+                        board.clear_highlights()
 
                     moves = start.piece.calculate_moves(board)
-                    for mv in moves:
-                        if mv.end_pos == end.pos:
-                            board.move(board.clicked_blocks)
-                        else:
-                            continue
-                        for block in blocks:
-                            block.clicked = False
-                            block.poss_move = False
+                    if any(mv.end_pos == end.pos for mv in moves):
+                        board.move(board.clicked_blocks, moves)
+                        board.clear_highlights()
 
                 board.clicked_blocks.clear()
 
@@ -120,51 +246,37 @@ class Block:
                 If all the logic fails then just do nothing, clear the cache.
                 """
 
-                # Reset the click state buffer, only for visual
+                # Reset the click state, only for visual
                 # no need to append to clicked_blocks, because
                 # it's not a valid selection.
-                self.clicked = next(self.block_clicked)
+                self.clicked = not self.clicked
 
                 board.clicked_blocks.clear()
 
-    def draw(self, screen: pygame.Surface):
-        # Draw the background color of the block
-        if self.clicked:
-            pygame.draw.rect(screen, self.clicked_color, self.pg_rect)
-        else:
-            pygame.draw.rect(screen, self.color, self.pg_rect)
-
-        if self.poss_move:
-            pygame.draw.rect(screen, (155, 204, 255), self.pg_rect)
-
-        if self.piece:
-            pg_img = pygame.image.load(self.piece.img_path)
-            screen.blit(
-                pg_img,
-                (
-                    self.pg_rect.center[0] - pg_img.get_width() // 2,
-                    self.pg_rect.center[1] - pg_img.get_width() // 2,
-                ),
-            )
+    def piece_blit(self) -> Tuple[pygame.Surface, Tuple[int, int]]:
+        """The (image, position) pair that draws the block's piece centered on the block."""
+        pg_img = _IMG_CACHE.get(self.piece.img_path)
+        if pg_img is None:
+            pg_img = pygame.image.load(self.piece.img_path).convert_alpha()
+            _IMG_CACHE[self.piece.img_path] = pg_img
 
-
-class BlockFactory:
-    def __call__(
-        self, pos: Tuple[int, int], color: Tuple[int, int, int], block_size: int
-    ):
-        return Block(pos, color, block_size)
+        return pg_img, (
+            self.pg_rect.center[0] - pg_img.get_width() // 2,
+            self.pg_rect.center[1] - pg_img.get_width() // 2,
+        )
 
 
 class Board:
+    # Set on the boards `clone` makes, they can't stand in for the board on screen.
+    is_clone: bool = False
+
     def __init__(self, width: int, height: int, player: str):
         assert player in ["w", "b"], f"Player can be eiter white ('w') or black ('b')"
 
         # Get screen widht, height borders
         self.s_width, self.s_height = width, height
 
-        self.block_factory = BlockFactory()
         self.piece_factory = PieceFactory((self.s_width, self.s_height))
-        self.move_factory = MoveFactory()
 
         self.players: List[str] = ["w" if player == "b" else "b", player]
         self.c_players = cycle(self.players)
@@ -175,93 +287,110 @@ class Board:
         # A buffer to track all clicked blocks in the board
         self.clicked_blocks: deque["Block"] = deque([], maxlen=2)
         self.block_to_exec_move: Optional[Block] = None
-        self.board_states: List[str] = []
 
-        # Variable to track how many times we perform an undo, or step ahead
-        self.board_hist_mov: int = 0
+        # Every played move packed in a single int, enough to undo it (see `NO_CAPTURE`).
+        self.move_history: array = array("L")
+
+        # Bumped whenever the pieces move, the pieces cache their moves against it.
+        self._version: int = 0
 
         # Game over condition
         self.game_over: bool = False
         self.winner: Optional[str] = None
 
-        # Hardcoded positions for all pieces.
-        init_positions = {
-            "king": [(0, 3), (7, 4)],
-            "queen": [(0, 4), (7, 3)],
-            "rook": [(0, 0), (0, 7), (7, 0), (7, 7)],
-            "bishop": [(0, 2), (0, 5), (7, 2), (7, 5)],
-            "knight": [(0, 1), (0, 6), (7, 1), (7, 6)],
-            "pawn": [(i, j) for i in [1, 6] for j in range(8)],
-        }
-
         # Create 64 Block objects
-        self.blocks: List[List[Block]] = []
-        for i in range(8):
-            row_blocks: List["Block"] = []
-            for j in range(8):
-                block_color = (255, 255, 255) if (i + j) % 2 == 0 else (0, 100, 0)
-                row_blocks.append(
-                    self.block_factory(
-                        pos=(i, j),
-                        color=block_color,
-                        block_size=self.s_width // 7,
-                    )
-                )
-            self.blocks.append(row_blocks)
+        block_size = self.s_width // 7
+        self.blocks: List[List[Block]] = [
+            [Block((i, j), _COLOR_GRID[i][j], block_size) for j in range(8)]
+            for i in range(8)
+        ]
+
+        # The board shape never changes, flatten it once for the loops over all blocks.
+        self._flat_blocks: Tuple[Block, ...] = tuple(
+            block for row in self.blocks for block in row
+        )
 
-        # Create the board pieces
-        self.pieces: List[Piece] = []
-        for name, pos in init_positions.items():
-            i = 0
-            for p in pos:
-                x, y = p
+        # The checkerboard never changes either, render it once and blit it every frame.
+        self._bg_surface = pygame.Surface(
+            (self.blocks[7][7].pg_rect.right, self.blocks[7][7].pg_rect.bottom)
+        )
+        for block in self._flat_blocks:
+            pygame.draw.rect(self._bg_surface, block.color, block.pg_rect)
 
-                if i < len(pos) // 2:
-                    temp_team = "w"
-                else:
-                    temp_team = "b"
+        # The background with the highlights and the pieces, see `_compose_board`.
+        self._board_surface = self._bg_surface.copy()
+        self._board_key: Optional[Tuple[int, frozenset]] = None
 
-                self.pieces.append(self.piece_factory(name, (y, x), temp_team))
-                self.blocks[y][x].piece = self.pieces[-1]
-                i += 1
+        # Blocks that are clicked or show a possible move, drawn on top of the background.
+        self._dirty_blocks: Set[Block] = set()
+        self._highlight_clicked = pygame.Surface(self.blocks[0][0].pg_rect.size)
+        self._highlight_clicked.fill(self.blocks[0][0].clicked_color)
+        self._highlight_poss = pygame.Surface(self.blocks[0][0].pg_rect.size)
+        self._highlight_poss.fill((155, 204, 255))
 
-        self.serialize()
+        # The info panel text only changes on a player switch or at the end of the game.
+        pygame.font.init()
+        self._font = pygame.font.Font(None, 36)
+        self._text_cache: Dict[str, pygame.Surface] = {}
+
+        # Create the board pieces
+        self.pieces: List[Piece] = []
+        for name, (x, y), team in INITIAL_PLACEMENTS:
+            piece = self.piece_factory(name, (x, y), team)
+            self.pieces.append(piece)
+            self.blocks[x][y].piece = piece
+
+        # One bitboard per (team, name) pair, a square (x, y) maps to bit x * 8 + y.
+        self.bb: List[int] = [0] * 12
+        self.occ_w: int = 0
+        self.occ_b: int = 0
+        self.occ: int = 0
+        # Zobrist hash of the pieces and the side to move, every move XORs it up to date.
+        self.zhash: int = 0
+        # Material balance, white positive, only captures change it.
+        self.material_balance: int = 0
+        self._sync_bitboards()
+
+        # Search results by Zobrist hash, allocated by the first search (see `bot.minimax`).
+        self.transposition_table: Optional[List[Optional[TTEntry]]] = None
 
     def find_by_pos_mouse(
         self, pos: Tuple[int, int], return_piece: Optional[bool] = None
     ) -> Optional[Block]:
         """
-        Method for finding a Piece object in the board by it's position.
+        Method for finding a Block object in the board by the mouse position.
 
-        Iterate through all of board pieces and match their position with the given position.
-        Checking for the team of the piece is unnecessary since we choose by position on the board.
+        Block x starts at x * block_size // 2, so the grid coordinates of the mouse
+        give the block directly, up to rounding when block_size is odd. Only that block
+        and the next one on each axis can hold the position, their rects decide.
 
         Parameters
         ----------
         pos     : Tuple[int]
-            The posiiton we wish to investigate in the board.
+            The mouse position in screen pixels.
         return_piece : bool
             A selector for returning the whole block or the piece on the requested block.
 
         Returns
         -------
-        Union[bool, Piece]
-            The piece found or False.
+        Optional[Block]
+            The block found or None when clicking outside of the board.
         """
-        found_block: Optional[Block] = None
-        blocks = flatten_list(self.blocks)
+        block_size = self.blocks[0][0].block_size
+        x, y = pos[0] * 2 // block_size, pos[1] * 2 // block_size
+        for i in (x, x + 1):
+            for j in (y, y + 1):
+                if 0 <= i < 8 and 0 <= j < 8 and self.blocks[i][j].pg_rect.collidepoint(pos):
+                    return self.blocks[i][j]
 
-        for block in blocks:
-            if block.pg_rect.collidepoint(pos):
-                found_block = block
-
-        return found_block
+        return None
 
     def find_by_pos(self, pos: Tuple[int, int]) -> Optional[Piece]:
         """
         Method for finding a Piece object in the board by it's position.
 
-        Iterate through all of board pieces and match their position with the given position.
+        The occupancy bitboard tells us if the square is empty, only then
+        we pay for fetching the Piece object from its block.
         Checking for the team of the piece is unnecessary since we choose by position on the board.
 
         Parameters
@@ -273,69 +402,241 @@ class Board:
         Union[bool, Piece]
             The piece found or False.
         """
+        x, y = pos
+        if not (0 <= x < 8 and 0 <= y < 8):
+            return None
+
+        if not (self.occ >> (x * 8 + y)) & 1:
+            return None
+
+        return self.blocks[x][y].piece
+
+    def piece_index(self, pos: Tuple[int, int]) -> Optional[int]:
+        """
+        Method for finding which bitboard holds the given position.
+
+        Parameters
+        ----------
+        pos     : Tuple[int]
+            The position we wish to investigate in the board.
+
+        Returns
+        -------
+        Optional[int]
+            The index of the bitboard in `self.bb` (see `PIECES`) or None for an empty square.
+        """
+        sq = pos[0] * 8 + pos[1]
+        if not (self.occ >> sq) & 1:
+            return None
+
+        for i, b in enumerate(self.bb):
+            if (b >> sq) & 1:
+                return i
 
-        # Are there 2 pieces in the board with the same position?
-        piece_positions = [p.ind_pos for p in self.pieces]
-        for i in range(8):
-            for j in range(8):
-                if piece_positions.count((i, j)) > 1:
-                    raise ValueError(f"A block cannot hold 2 pieces at the same time.")
+        return None
 
-        found_piece: Optional[Piece] = None
+    def _sync_bitboards(self):
+        """
+        Rebuild all the bitboards from `self.pieces`.
+        Only needed when the pieces are replaced wholesale, moves update the bitboards incrementally.
+        """
+        self.bb = [0] * 12
+        self._pieces_by_color: Dict[str, List[Piece]] = {"w": [], "b": []}
+        seen = 0
         for piece in self.pieces:
             x, y = piece.ind_pos
-            if (x, y) == pos:
-                found_piece = piece
+            bit = 1 << (x * 8 + y)
+            if seen & bit:
+                raise ValueError("A block cannot hold 2 pieces at the same time.")
+            seen |= bit
+            self.bb[PIECE_IDX[(piece.team, piece.name)]] |= bit
+            self._pieces_by_color[piece.team].append(piece)
+
+        self._update_occupancy()
+        self.zhash = zobrist_hash(self.bb, self.current_player)
+        self.material_balance = material(self.bb)
+        self._update_game_over()
+        self._version += 1
+
+    def _update_game_over(self):
+        """The game is over once a king is captured, the player who captured it wins."""
+        if not self.bb[KING]:
+            self.winner = "b"
+        elif not self.bb[6 + KING]:
+            self.winner = "w"
+        else:
+            self.winner = None
+        self.game_over = self.winner is not None
+
+    def _update_occupancy(self):
+        bb = self.bb
+        self.occ_w = bb[0] | bb[1] | bb[2] | bb[3] | bb[4] | bb[5]
+        self.occ_b = bb[6] | bb[7] | bb[8] | bb[9] | bb[10] | bb[11]
+        self.occ = self.occ_w | self.occ_b
+
+    def move_targets(self, sq: int, idx: int) -> int:
+        """
+        Method to find all the squares a piece can move to, as a bitboard.
+
+        Parameters
+        ----------
+        sq      : int
+            The square of the piece, x * 8 + y.
+        idx     : int
+            The bitboard index of the piece (see `PIECES`).
 
-        return found_piece
+        Returns
+        -------
+        int
+            A bitboard with a set bit for every empty or enemy square the piece reaches.
+        """
+        return piece_targets(sq, idx, self.occ_w, self.occ_b)
+
+    def calculate_moves_for(self, piece: Piece) -> List[Move]:
+        """
+        Method to calculate all possible moves for a piece from the precomputed attack tables.
+
+        Parameters
+        ----------
+        piece   : Piece
+            A piece on the board.
+
+        Returns
+        -------
+        List[Move]
+            A list of all possible moves for the piece, empty when it's not the piece's turn.
+        """
+        if self.current_player != piece.team:
+            return []
+
+        start_pos = piece.ind_pos
+        targets = self.move_targets(start_pos[0] * 8 + start_pos[1], PIECE_IDX[(piece.team, piece.name)])
+        quiet_score, capture_score = MOVE_SCORES[piece.name]
+
+        # The targets are squares of the board by construction, so the moves are built
+        # directly instead of through `MoveFactory` and its bounds asserts, captures first.
+        moves: List[Move] = []
+        captures = targets & self.occ
+        while captures:
+            lsb = captures & -captures
+            captures ^= lsb
+            x, y = divmod(lsb.bit_length() - 1, 8)
+            moves.append(Move(piece, start_pos, (x, y), capture_score, True, self.blocks[x][y].piece))
+
+        quiets = targets & ~self.occ
+        while quiets:
+            lsb = quiets & -quiets
+            quiets ^= lsb
+            moves.append(Move(piece, start_pos, divmod(lsb.bit_length() - 1, 8), quiet_score, False))
+
+        return moves
+
+    def clear_highlights(self):
+        for block in self._dirty_blocks:
+            block.clicked = False
+            block.poss_move = False
+
+        self._dirty_blocks.clear()
 
     def clear_selections(self):
         self.clicked_blocks = deque([], maxlen=2)
 
-    def move(self, blocks: Sequence[Block]):
-        """This ASSUMES that blocks are already of length 2"""
+    def move(self, blocks: Sequence[Block], moves: Optional[List[Move]] = None):
+        """
+        This ASSUMES that blocks are already of length 2.
+        The caller can pass the moves it already calculated for the starting piece.
+        """
         piece: Optional[Piece] = blocks[0].piece
 
         if isinstance(piece, Piece):
-            # print([block.piece for block in blocks])
+            if moves is None:
+                moves = piece.calculate_moves(self)
 
-            av_moves = [p.end_pos for p in piece.calculate_moves(self)]
+            av_moves = [p.end_pos for p in moves]
             if blocks[1].pos in av_moves:
+                from_sq = blocks[0].pos[0] * 8 + blocks[0].pos[1]
+                to_sq = blocks[1].pos[0] * 8 + blocks[1].pos[1]
+                moving = PIECE_IDX[(piece.team, piece.name)]
+                captured = NO_CAPTURE
+
                 # Remove the captured piece
                 if isinstance(blocks[0].piece, Piece) and isinstance(blocks[1].piece, Piece):
+                    captured = PIECE_IDX[(blocks[1].piece.team, blocks[1].piece.name)]
+                    self.bb[captured] &= ~(1 << to_sq)
+                    self.zhash ^= ZOBRIST[captured][to_sq]
+                    self.material_balance -= PIECE_VALUE_TABLE[captured]
                     self.pieces.remove(blocks[1].piece)
+                    self._pieces_by_color[blocks[1].piece.team].remove(blocks[1].piece)
+
+                self.bb[moving] ^= (1 << from_sq) | (1 << to_sq)
+                self.zhash ^= ZOBRIST[moving][from_sq] ^ ZOBRIST[moving][to_sq]
+                self._update_occupancy()
+                self.move_history.append(from_sq | to_sq << 6 | captured << 12 | moving << 16)
 
                 if isinstance(blocks[0].piece, Piece):
                     blocks[1].piece = blocks[0].piece
-                    blocks[1].piece.name = blocks[0].piece.name
-                    blocks[1].piece.team = blocks[0].piece.team
                     blocks[1].piece.ind_pos = blocks[1].pos
-                    blocks[1].piece.img_path = blocks[0].piece.img_path
                     blocks[0].piece = None
 
             self.clear_selections()
             self.current_player = next(self.c_players)
+            self.zhash ^= ZOBRIST_SIDE
+            self._update_game_over()
+            self._version += 1
 
-    def update(self, screen: pygame.Surface):
-        pygame.font.init()
-        font = pygame.font.Font(None, 36)
+    def _compose_board(self):
+        """
+        Draw the checkerboard, then the highlighted blocks and the pieces on top
+        with a single batched blits call.
+        """
+        self._board_surface.blit(self._bg_surface, (0, 0))
 
-        current_player_text = font.render(
-            f"Currently playing: {self.current_player}", True, (0, 0, 0)
+        blits: List[Tuple[pygame.Surface, Tuple[int, int]]] = []
+        for block in self._dirty_blocks:
+            if block.clicked:
+                blits.append((self._highlight_clicked, block.pg_rect.topleft))
+            if block.poss_move:
+                blits.append((self._highlight_poss, block.pg_rect.topleft))
+
+        for piece in self.pieces:
+            x, y = piece.ind_pos
+            blits.append(self.blocks[x][y].piece_blit())
+
+        self._board_surface.blits(blits, doreturn=False)
+
+    def _render_text(self, text: str) -> pygame.Surface:
+        """Render the text once, then reuse the surface."""
+        surface = self._text_cache.get(text)
+        if surface is None:
+            surface = self._font.render(text, True, (0, 0, 0))
+            self._text_cache[text] = surface
+
+        return surface
+
+    def update(self, screen: pygame.Surface):
+        current_player_text = self._render_text(
+            f"Currently playing: {self.current_player}"
         )
 
         if self.game_over:
-            winner_text = font.render(f"Winner is {self.winner}!", True, (0, 0, 0))
+            winner_text = self._render_text(f"Winner is {self.winner}!")
         else:
             winner_text = None
 
         if len(self.clicked_blocks) > 1:
             self.move(self.clicked_blocks)
 
-        # Iterate all board blocks and draw them
-        for i in range(8):
-            for j in range(8):
-                self.blocks[i][j].draw(screen)
+        # The board only changes when a piece moves or a block is (un)highlighted,
+        # so it is composed again only then and the finished surface is blitted every frame.
+        board_key = (
+            self._version,
+            frozenset((block.pos, block.clicked, block.poss_move) for block in self._dirty_blocks),
+        )
+        if board_key != self._board_key:
+            self._board_key = board_key
+            self._compose_board()
+
+        screen.blit(self._board_surface, (0, 0))
 
         board_width_bounds = self.blocks[7][7].pg_rect.right
 
@@ -360,7 +661,7 @@ class Board:
         if winner_text:
             screen.blit(winner_text, (board_width_bounds + 50, 300))
 
-    def serialize(self, store: bool = True) -> Optional[str]:
+    def serialize(self) -> str:
         """
         This is a string representation of the board.
         The standard FEN notation won't be used, because
@@ -372,47 +673,42 @@ class Board:
             -> WR00WK10 K for king, k for knight, same for bishop
         And at the end of the string, we have the player t
         hat plays next.
-        """
 
-        board_state: str = ""
-        for piece in self.pieces:
-            board_state += piece.team[0].capitalize()
-            name = piece.name
-            if name == "knight" or name == "bishop":
-                board_state += name[0]
-            else:
-                board_state += name[0].capitalize()
+        The game itself keeps its history in `move_history`, this snapshot
+        is only needed to dump and replay positions (see visualize_search_space).
+        """
 
-            board_state += str(piece.ind_pos[0])
-            board_state += str(piece.ind_pos[1])
-        board_state += self.current_player
+        codes: List[str] = []
+        for square_codes, bb in zip(_STATE_CODES, self.bb):
+            while bb:
+                lsb = bb & -bb
+                bb ^= lsb
+                codes.append(square_codes[lsb.bit_length() - 1])
+        codes.append(self.current_player)
 
-        if store:
-            self.board_states.append(board_state)
-        else:
-            return board_state
+        return "".join(codes)
 
     def load_prev_state(self, state: Optional[str]=None):
         """
-        We need to convert the serialized string,
+        Without a state, take back the last played move from `move_history`.
+        Otherwise we need to convert the serialized string,
         to the Piece format.
         """
 
-        blocks = flatten_list(self.blocks)
+        if not state:
+            self._undo_last_move()
+            return
 
-        self.board_hist_mov += 1
+        blocks = self._flat_blocks
 
-        if self.board_hist_mov >= len(self.board_states):
-            self.board_hist_mov = len(self.board_states)
+        # A loaded position has no history to take back
+        self.move_history = array("L")
 
         # Remove all pieces from the board
         self.pieces = []
         for block in blocks:
             block.piece = None
 
-        if not state:
-            state = self.board_states[-self.board_hist_mov]
-
         # To avoid any excess iterations,
         # we know in "state", we represent each piece every 4 characters.
 
@@ -422,40 +718,52 @@ class Board:
 
             team = piece_repr[0].lower()
 
-            name: Optional[str] = None
-            match piece_repr[1]:
-                # Get the name
-                case "K":
-                    name = "king"
-                case "Q":
-                    name = "queen"
-                case "R":
-                    name = "rook"
-                case "b":
-                    name = "bishop"
-                case "k":
-                    name = "knight"
-                case "P":
-                    name = "pawn"
-                case _:
-                    raise NotImplementedError("Trying to identify a piece from a state string that does not exist!")
+            name = _LETTER_TO_NAME.get(piece_repr[1])
+            if name is None:
+                raise NotImplementedError("Trying to identify a piece from a state string that does not exist!")
 
             pos = (int(piece_repr[2]), int(piece_repr[3]))
 
-            # Create saved piece
-            self.pieces.append(self.piece_factory(name, pos, team))
+            # Create saved piece and assign it to its block
+            piece = self.piece_factory(name, pos, team)
+            self.pieces.append(piece)
+            self.blocks[pos[0]][pos[1]].piece = piece
 
-            # Assign pieces to the correct block
-            for piece in self.pieces:
-                # Get the position of each piece, and access
-                # its corresponding block.
-                x, y = piece.ind_pos
+        self._sync_bitboards()
 
-                self.blocks[x][y].piece = piece
-
-        else:
-            pass
-            # print("No previous stored states in board.")
+    def _undo_last_move(self):
+        """
+        Take back the last move by XOR-ing the moving piece's bits back
+        and restoring the captured piece, if any.
+        """
+        if not self.move_history:
+            return
+
+        from_sq, to_sq, captured, moving = decode_move(self.move_history.pop())
+
+        self.bb[moving] ^= (1 << from_sq) | (1 << to_sq)
+        self.zhash ^= ZOBRIST[moving][from_sq] ^ ZOBRIST[moving][to_sq] ^ ZOBRIST_SIDE
+
+        start = self.blocks[from_sq >> 3][from_sq & 7]
+        end = self.blocks[to_sq >> 3][to_sq & 7]
+        start.piece, end.piece = end.piece, None
+        if start.piece:
+            start.piece.ind_pos = start.pos
+
+        if captured != NO_CAPTURE:
+            self.bb[captured] |= 1 << to_sq
+            self.zhash ^= ZOBRIST[captured][to_sq]
+            self.material_balance += PIECE_VALUE_TABLE[captured]
+            team, name = PIECES[captured]
+            end.piece = self.piece_factory(name, end.pos, team)
+            self.pieces.append(end.piece)
+            self._pieces_by_color[team].append(end.piece)
+
+        self._update_occupancy()
+        self.clear_selections()
+        self.current_player = next(self.c_players)
+        self._update_game_over()
+        self._version += 1
 
     def get_pieces_for_player(self, player: str) -> List[Piece]:
         """
@@ -469,17 +777,53 @@ class Board:
         Returns
         -------
         List[Piece]
-            A list of all the pieces a player has.
+            A list of all the pieces a player has, kept up to date by `move`
+            and `load_prev_state`, so don't mutate it.
+        """
+        return self._pieces_by_color[player]
+
+    def mobility(self, player: str) -> int:
         """
+        Method to count the squares a player can move to.
+        The targets of all the player's pieces are OR-ed together,
+        so a square reached by two pieces counts once.
 
-        return [piece for piece in self.pieces if piece.team == player]
+        Parameters
+        ----------
+        player  : str
+            The team of the player.
 
-    def score_board(self, player: str) -> float:
+        Returns
+        -------
+        int
+            The number of distinct squares the player's pieces can move to.
+        """
+        return mobility(self.bb, 0 if player == "w" else 6, self.occ_w, self.occ_b)
+
+    def in_check(self, player: str) -> bool:
+        """
+        Whether the player's king is attacked by the other player.
+        A player without a king (it got captured) is never in check.
+        """
+        first = 0 if player == "w" else 6
+        king = self.bb[first]
+        if not king:
+            return False
+
+        return is_attacked(king.bit_length() - 1, 6 - first, self.bb, self.occ)
+
+    def has_non_pawn_material(self, player: str) -> bool:
+        """Whether the player has a queen, rook, bishop or knight left."""
+        first = 0 if player == "w" else 6
+        bb = self.bb
+        return bool(bb[first + 1] | bb[first + 2] | bb[first + 3] | bb[first + 4])
+
+    def score_board(self, player: str) -> int:
         """
         Method to evaluate the current state of the board.
         Each piece is given a weight value. The current implementation
         sums all the pieces values each player posses and also the
-        number of all possible moves for each player.
+        number of distinct squares each player can move to.
 
         Parameters
         ----------
@@ -487,39 +831,269 @@ class Board:
             The maximizing player.
         Returns
         -------
-        float
+        int
             The actual score minimax sees.
         """
-        PIECE_VALUES = {
-            "king": 1000,
-            "queen": 9,
-            "rook": 5,
-            "bishop": 3,
-            "knight": 3,
-            "pawn": 1,
-        }
-        player_score: int = 0
-        opponent_score: int = 0
-        player_valid_moves: int = 0
-        opponent_valid_moves: int = 0
-
-        max_player = self.bot_player
-        for piece in self.pieces:
-            value: float = PIECE_VALUES.get(piece.name, 0)
-
-            if piece.team == max_player:
-                player_score += value
-                player_valid_moves += len(piece.calculate_moves(self))
-            else:
-                opponent_score += value
-                opponent_valid_moves += len(piece.calculate_moves(self))
+        # The material balance is kept up to date by the moves and counts white positive,
+        # the mobility difference is taken the same way and both flip when the bot plays black.
+        bb, occ_w, occ_b = self.bb, self.occ_w, self.occ_b
+        score = self.material_balance + 2 * (
+            mobility(bb, 0, occ_w, occ_b) - mobility(bb, 6, occ_w, occ_b)
+        )
 
         # The neutral point is 0.0 which is the starting score.
-        # If player_score > opponent_score we have a positive score and a negative likewise.
+        # If the bot has more material we have a positive score and a negative likewise.
         # The same applies for the valid_moves
-        return (player_score - opponent_score) + 2 * (
-            player_valid_moves - opponent_valid_moves
+        return score if self.bot_player == "w" else -score
+
+    def generate_moves(self, captures_only: bool = False) -> List[SearchMove]:
+        """
+        Method to generate the moves of the player whose turn it is, straight from the bitboards.
+        Unlike `Piece.calculate_moves` no Piece or Move objects are involved,
+        so it stays valid while the search plays moves with `make_move`.
+
+        Parameters
+        ----------
+        captures_only   : bool
+            Mask the targets with the enemy pieces, so no quiet move is generated at all.
+
+        Returns
+        -------
+        List[SearchMove]
+            All the moves packed into ints, the score is the `MVV_LVA` score
+            of a capture and 0 for a quiet move.
+        """
+        first = 0 if self.current_player == "w" else 6
+        enemy_first = 6 - first
+        bb, occ = self.bb, self.occ
+        enemy = self.occ_b if first == 0 else self.occ_w
+
+        # One pass over the bitboards, the attacks come straight from the tables
+        # and every piece emits its captures before its quiet moves.
+        moves: List[SearchMove] = []
+        for ptype in range(PAWN):
+            moving = first + ptype
+            pieces = bb[moving]
+            while pieces:
+                lsb = pieces & -pieces
+                pieces ^= lsb
+                from_sq = lsb.bit_length() - 1
+
+                if ptype == KNIGHT:
+                    targets = KNIGHT_ATTACKS[from_sq]
+                elif ptype == BISHOP:
+                    targets = bishop_attacks(from_sq, occ)
+                elif ptype == ROOK:
+                    targets = rook_attacks(from_sq, occ)
+                elif ptype == QUEEN:
+                    targets = queen_attacks(from_sq, occ)
+                else:
+                    targets = KING_ATTACKS[from_sq]
+
+                captures = targets & enemy
+                while captures:
+                    to_mask = captures & -captures
+                    captures ^= to_mask
+                    to_sq = to_mask.bit_length() - 1
+
+                    captured = enemy_first
+                    while not bb[captured] & to_mask:
+                        captured += 1
+                    moves.append(
+                        from_sq | to_sq << 6 | captured << 12 | moving << 16
+                        | MVV_LVA[captured][moving] << 20
+                    )
+
+                if captures_only:
+                    continue
+                quiets = targets & ~occ
+                while quiets:
+                    to_mask = quiets & -quiets
+                    quiets ^= to_mask
+                    moves.append(
+                        from_sq | (to_mask.bit_length() - 1) << 6 | NO_CAPTURE << 12 | moving << 16
+                    )
+
+        # The pawns move all at once, every target set knows where its pawns came from.
+        moving = first + PAWN
+        pawn_sets = pawn_move_sets(bb[moving], first == 0, occ, enemy)
+        offsets = PAWN_FROM_OFFSETS_W if first == 0 else PAWN_FROM_OFFSETS_B
+        for i, (targets, offset) in enumerate(zip(pawn_sets, offsets)):
+            if captures_only and i < 2:
+                continue
+            while targets:
+                to_mask = targets & -targets
+                targets ^= to_mask
+                to_sq = to_mask.bit_length() - 1
+
+                if i >= 2:
+                    captured = enemy_first
+                    while not bb[captured] & to_mask:
+                        captured += 1
+                    moves.append(
+                        (to_sq + offset) | to_sq << 6 | captured << 12 | moving << 16
+                        | MVV_LVA[captured][moving] << 20
+                    )
+                else:
+                    moves.append((to_sq + offset) | to_sq << 6 | NO_CAPTURE << 12 | moving << 16)
+
+        return moves
+
+    def make_move(self, move: SearchMove) -> UndoInfo:
+        """
+        Play a move on the bitboards only, the blocks and the Piece objects are left untouched.
+        Every `make_move` has to be paired with an `undo_move` before the board is drawn again.
+
+        Parameters
+        ----------
+        move    : SearchMove
+            A move from `generate_moves`.
+
+        Returns
+        -------
+        UndoInfo
+            What `undo_move` needs to take the move back.
+        """
+        from_sq, to_sq = move & 63, (move >> 6) & 63
+        captured, moving = (move >> 12) & 0xF, (move >> 16) & 0xF
+        from_to = (1 << from_sq) | (1 << to_sq)
+
+        self.bb[moving] ^= from_to
+        self.zhash ^= ZOBRIST[moving][from_sq] ^ ZOBRIST[moving][to_sq] ^ ZOBRIST_SIDE
+        if moving < 6:
+            self.occ_w ^= from_to
+        else:
+            self.occ_b ^= from_to
+
+        if captured != NO_CAPTURE:
+            self.bb[captured] ^= 1 << to_sq
+            self.zhash ^= ZOBRIST[captured][to_sq]
+            self.material_balance -= PIECE_VALUE_TABLE[captured]
+            if captured < 6:
+                self.occ_w ^= 1 << to_sq
+            else:
+                self.occ_b ^= 1 << to_sq
+
+        self.occ = self.occ_w | self.occ_b
+
+        prev_player = self.current_player
+        self.current_player = "b" if prev_player == "w" else "w"
+
+        return from_sq, to_sq, captured, moving, prev_player
+
+    def undo_move(self, undo: UndoInfo):
+        """
+        Take back a move played with `make_move`.
+
+        Parameters
+        ----------
+        undo    : UndoInfo
+            The value `make_move` returned.
+        """
+        from_sq, to_sq, captured, moving, prev_player = undo
+        from_to = (1 << from_sq) | (1 << to_sq)
+
+        self.bb[moving] ^= from_to
+        self.zhash ^= ZOBRIST[moving][from_sq] ^ ZOBRIST[moving][to_sq] ^ ZOBRIST_SIDE
+        if moving < 6:
+            self.occ_w ^= from_to
+        else:
+            self.occ_b ^= from_to
+
+        if captured != NO_CAPTURE:
+            self.bb[captured] ^= 1 << to_sq
+            self.zhash ^= ZOBRIST[captured][to_sq]
+            self.material_balance += PIECE_VALUE_TABLE[captured]
+            if captured < 6:
+                self.occ_w ^= 1 << to_sq
+            else:
+                self.occ_b ^= 1 << to_sq
+
+        self.occ = self.occ_w | self.occ_b
+        self.current_player = prev_player
+
+    def make_null_move(self) -> str:
+        """
+        Pass the turn without moving, used by the search for null-move pruning.
+        Returns the player that passed, `undo_null_move` needs it.
+        """
+        prev_player = self.current_player
+        self.current_player = "b" if prev_player == "w" else "w"
+        self.zhash ^= ZOBRIST_SIDE
+
+        return prev_player
+
+    def undo_null_move(self, prev_player: str):
+        self.current_player = prev_player
+        self.zhash ^= ZOBRIST_SIDE
+
+    def clone(self) -> SearchBoard:
+        """
+        A rendering-free copy of the board for the search. It holds only the bitboards
+        and the game state, so it supports `generate_moves`, `make_move`, `undo_move`,
+        the null move, `score_board` and `serialize`. It has no blocks, pieces or drawing,
+        every method that needs them raises NotImplementedError (see `SearchBoard`).
+        The transposition table is shared with the board it was cloned from.
+        Use `copy.deepcopy` for a full, playable copy.
+        """
+        board = SearchBoard.__new__(SearchBoard)
+        board.players = self.players
+        board.current_player = self.current_player
+        board.human_player = self.human_player
+        board.bot_player = self.bot_player
+        board.game_over = self.game_over
+        board.winner = self.winner
+        board.move_history = array("L", self.move_history)
+        board.bb = self.bb[:]
+        board.occ_w, board.occ_b, board.occ = self.occ_w, self.occ_b, self.occ
+        board.zhash = self.zhash
+        board.material_balance = self.material_balance
+        board.transposition_table = self.transposition_table
+
+        return board
+
+    def __deepcopy__(self, memo) -> Board:
+        # A full copy with its own blocks and pieces, only the pygame render caches are shared
+        # and the composed board surface, which `update` draws on, is copied.
+        board = type(self).__new__(type(self))
+        memo[id(self)] = board
+        for name, value in self.__dict__.items():
+            if name in _SHARED_ON_COPY:
+                setattr(board, name, value)
+            elif name == "_board_surface":
+                board._board_surface = value.copy()
+            else:
+                setattr(board, name, copy.deepcopy(value, memo))
+
+        return board
+
+
+def _needs_pieces(name: str):
+    """A `SearchBoard` stand-in for a `Board` method that needs the blocks or the pieces."""
+
+    def unsupported(self, *args, **kwargs):
+        raise NotImplementedError(
+            f"A SearchBoard has no blocks or pieces, call {name} on the Board it was cloned from."
         )
 
-    def clone(self):
-        return copy.deepcopy(self)
+    return unsupported
+
+
+class SearchBoard(Board):
+    """
+    The rendering-free board `Board.clone` returns for the search.
+    It only holds the bitboards and the game state, the methods
+    that need the blocks or the pieces fail with a clear error.
+    """
+
+    is_clone = True
+
+    find_by_pos_mouse = _needs_pieces("find_by_pos_mouse")
+    find_by_pos = _needs_pieces("find_by_pos")
+    calculate_moves_for = _needs_pieces("calculate_moves_for")
+    clear_highlights = _needs_pieces("clear_highlights")
+    clear_selections = _needs_pieces("clear_selections")
+    move = _needs_pieces("move")
+    update = _needs_pieces("update")
+    load_prev_state = _needs_pieces("load_prev_state")
+    get_pieces_for_player = _needs_pieces("get_pieces_for_player")
@@ -1,134 +1,554 @@
 from __future__ import annotations
-from math import inf
+from time import monotonic
 
 from typing import List, Tuple, Optional, TextIO, TYPE_CHECKING
 
+from board import PIECES, NO_CAPTURE, decode_move
+from bitboard import KING, mirror_hash
+
 if TYPE_CHECKING:
-    from src.board import Board
+    from src.board import Board, SearchMove, UndoInfo, TTEntry
     from src.piece import Piece, Move
 
+# Scores are ints, a won game scores MAX_SCORE and a lost one MIN_SCORE,
+# far beyond any material and mobility score.
+MAX_SCORE: int = 10**9
+MIN_SCORE: int = -MAX_SCORE
+
+# Transposition table size, a power of two so the slot is the low bits of the hash.
+TT_SIZE: int = 1 << 20
+TT_MASK: int = TT_SIZE - 1
+
+# Quiet moves that caused a beta cutoff, two slots per remaining depth.
+Killers = List[List[int]]
+# How much the quiet moves of a piece to a square cut off so far, indexed moving << 6 | to_sq.
+History = List[int]
+
+# Captures keep being searched past the search depth for at most this many plies (quiescence).
+QUIESCENCE_PLIES: int = 6
+
+# Null-move pruning: the reduction of the null-move search and the least depth it is tried at.
+NULL_MOVE_R: int = 2
+NULL_MOVE_MIN_DEPTH: int = 3
+# Stands for passing the turn in a frame's moves, every real move is positive.
+NULL_MOVE: SearchMove = -1
+
+# Late-move reductions: from this depth on, the quiet moves after the first few
+# are searched this many plies shallower, and again at full depth if they beat alpha.
+LMR_MIN_DEPTH: int = 3
+LMR_MIN_MOVES: int = 4
+LMR_R: int = 1
+
+# What a stored score is: exact, a lower bound (the search failed high)
+# or an upper bound (no move reached alpha). Scores are stored for the side to move.
+EXACT, LOWER, UPPER = range(3)
+
+# On a miss, nodes with at least this depth left also probe the mirrored position
+# (see `bitboard.ZOBRIST_MIRROR`), hashing it from scratch only pays off near the root.
+# Colors and the side to move both swap, so its score for the side to move is the same.
+MIRROR_MIN_DEPTH: int = 3
+# Flips the rows of both squares of a packed from_sq | to_sq << 6.
+_MIRROR_FROM_TO: int = 7 | 7 << 6
+
+# A traced search writes the explored board states in batches of this many lines.
+TRACE_BATCH: int = 8192
+
+
+def _to_piece_move(
+    board: Board, move: Optional[SearchMove]
+) -> Tuple[Optional[Piece], Optional[Move]]:
+    """
+    Translate the searched move back to the Piece and Move objects of the board,
+    the caller plays it with `board.move`.
+    """
+    if move is None:
+        return None, None
+
+    from_sq, to_sq, _, _ = decode_move(move)
+    piece = board.blocks[from_sq >> 3][from_sq & 7].piece
+    if piece is None:
+        return None, None
+
+    for mv in board.calculate_moves_for(piece):
+        if mv.end_pos == (to_sq >> 3, to_sq & 7):
+            return piece, mv
+
+    return piece, None
+
+
+def _order_moves(
+    moves: List[SearchMove], tt_move: int, killers: List[int], history: History
+) -> List[SearchMove]:
+    """
+    Search order: the transposition table move, the captures by their MVV-LVA score,
+    the killer moves and then the rest of the quiet moves by their history score.
+    Moves are compared by their from_sq | to_sq << 6 bits.
+    """
+    first: List[SearchMove] = []
+    captures: List[SearchMove] = []
+    killer_moves: List[SearchMove] = []
+    quiets: List[SearchMove] = []
+    for move in moves:
+        from_to = move & 0xFFF
+        if from_to == tt_move:
+            first.append(move)
+        elif (move >> 12) & 0xF != NO_CAPTURE:
+            captures.append(move)
+        elif from_to in killers:
+            killer_moves.append(move)
+        else:
+            quiets.append(move)
+
+    captures.sort(reverse=True)
+    quiets.sort(key=lambda x: history[(x >> 10) & 0x3C0 | (x >> 6) & 63], reverse=True)
+
+    return first + captures + killer_moves + quiets
+
+
+def _store_cutoff(killers: List[int], history: History, move: SearchMove, depth: int):
+    """Remember a quiet move that caused a beta cutoff, deeper cutoffs weigh more in the history."""
+    if (move >> 12) & 0xF != NO_CAPTURE:
+        return
+
+    history[(move >> 10) & 0x3C0 | (move >> 6) & 63] += depth * depth
+
+    from_to = move & 0xFFF
+    if killers[0] != from_to:
+        killers[1] = killers[0]
+        killers[0] = from_to
+
+
+class _Frame:
+    """
+    One node of the search on the explicit stack of `minimax`.
+    Its scores and window are seen from the side to move (negamax).
+    """
+
+    __slots__ = (
+        "depth",
+        "a",
+        "b",
+        "moves",
+        "next",
+        "best_score",
+        "best_move",
+        "undo",
+        "key",
+        "window_a",
+        "window_b",
+        "reduce_from",
+        "reduced",
+    )
+
+    def __init__(
+        self,
+        depth: int,
+        a: int,
+        b: int,
+        moves: List[SearchMove],
+        key: int,
+    ):
+        self.depth = depth
+        self.a = a
+        self.b = b
+        self.moves = moves
+        # Index of the next move to search.
+        self.next = 0
+        self.best_score = MIN_SCORE
+        self.best_move: Optional[SearchMove] = None
+        # How to take back the move whose subtree is being searched.
+        self.undo: Optional[UndoInfo] = None
+        self.key = key
+        # The alpha-beta window the moves are searched with, after the transposition table narrowed it.
+        self.window_a = a
+        self.window_b = b
+        # Index of the first move late-move reductions may apply to,
+        # and whether the move being searched is reduced.
+        self.reduce_from = len(moves)
+        self.reduced = False
+
+
+def _enter(
+    board: Board,
+    depth: int,
+    a: int,
+    b: int,
+    player: str,
+    table: List[Optional[TTEntry]],
+    killers: Killers,
+    history: History,
+    is_root: bool,
+) -> Tuple[Optional[int], Optional[_Frame]]:
+    """
+    Start searching the current position of the board, `player` is the side to move
+    and the window and the score are seen from its side.
+    Returns its score when it is a leaf or a transposition table hit settles it,
+    otherwise the frame that searches its moves.
+    """
+    bot_player, bb = board.bot_player, board.bb
+    sign = 1 if player == bot_player else -1
+
+    # `make_move` leaves `board.game_over` alone, a captured king shows on the bitboards.
+    white_king, black_king = bb[KING], bb[6 + KING]
+    if not white_king or not black_king:
+        winner = "b" if not white_king else "w"
+        return sign * (MAX_SCORE if winner == bot_player else MIN_SCORE), None
+
+    if depth <= 0:
+        return _enter_quiescence(board, depth, a, b, player, sign)
+
+    key = board.zhash
+    entry = table[key & TT_MASK]
+    if (entry is None or entry[0] != key) and depth >= MIRROR_MIN_DEPTH:
+        mirror_key = mirror_hash(bb, player)
+        mirror_entry = table[mirror_key & TT_MASK]
+        if mirror_entry is not None and mirror_entry[0] == mirror_key:
+            _, tt_depth, tt_score, tt_flag, tt_move = mirror_entry
+            entry = (key, tt_depth, tt_score, tt_flag, tt_move ^ _MIRROR_FROM_TO if tt_move >= 0 else -1)
+
+    tt_move = -1
+    if entry is not None and entry[0] == key:
+        _, tt_depth, tt_score, tt_flag, tt_move = entry
+
+        # The root still has to search to hand back a move.
+        if tt_depth >= depth and not is_root:
+            if tt_flag == EXACT:
+                return tt_score, None
+            if tt_flag == LOWER:
+                a = max(a, tt_score)
+            else:
+                b = min(b, tt_score)
+            if a >= b:
+                return tt_score, None
+
+    moves = _order_moves(board.generate_moves(), tt_move, killers[depth], history)
+    frame = _Frame(depth, a, b, moves, key)
+
+    # Nothing is pruned or reduced at the root, which has to hand back its best move,
+    # or in check, where passing is illegal and every reply matters.
+    if is_root or depth < min(NULL_MOVE_MIN_DEPTH, LMR_MIN_DEPTH) or board.in_check(player):
+        return None, frame
+
+    if depth >= LMR_MIN_DEPTH:
+        frame.reduce_from = LMR_MIN_MOVES
+
+    # Null-move pruning: if passing the turn still fails high, a real move will too.
+    # Not tried with only pawns left, where passing can be the best move (zugzwang).
+    if (
+        depth >= NULL_MOVE_MIN_DEPTH
+        and abs(b) != MAX_SCORE
+        and board.has_non_pawn_material(player)
+    ):
+        moves.insert(0, NULL_MOVE)
+        frame.reduce_from += 1
+
+    return None, frame
+
+
+def _enter_quiescence(
+    board: Board, depth: int, a: int, b: int, player: str, sign: int
+) -> Tuple[Optional[int], Optional[_Frame]]:
+    """
+    Past the search depth only captures are searched, so a leaf is never scored in the middle
+    of an exchange. The player can always stand pat and keep the static score instead.
+    """
+    stand_pat = sign * board.score_board(player)
+    if depth <= -QUIESCENCE_PLIES or stand_pat >= b:
+        return stand_pat, None
+    if stand_pat > a:
+        a = stand_pat
+
+    captures = board.generate_moves(captures_only=True)
+    if not captures:
+        return stand_pat, None
+    captures.sort(reverse=True)
+
+    frame = _Frame(depth, a, b, captures, -1)
+    frame.best_score = stand_pat
+
+    return None, frame
+
+
 def minimax(
     board: Board,
     depth: int,
     player: str,
     total_explored_states: int = 0,
-    a: float=-float("inf"),
-    b: float=float("inf"),
+    a: int=MIN_SCORE,
+    b: int=MAX_SCORE,
     writer: Optional[TextIO]=None,
-) -> Tuple[float, Optional[Piece], Optional[Move], int]:
+    trace: bool=False,
+    verbose: bool=False,
+    killers: Optional[Killers]=None,
+    history: Optional[History]=None,
+    piece_board: Optional[Board]=None,
+) -> Tuple[int, Optional[Piece], Optional[Move], int]:
     """
-    A simple implementation of the minimax function with alpha-beta pruning.
+    A simple implementation of the minimax function with alpha-beta pruning,
+    written as negamax: every node scores from the side of its player to move
+    and a child's score is negated for its parent. The score returned
+    and the window `a`, `b` are seen from the bot's side as before.
+    The moves are played and taken back on the same board (`make_move`/`undo_move`),
+    only the best move of the root is translated back to Piece and Move objects.
+
+    The tree is walked with an explicit stack of `_Frame`s instead of recursion,
+    a frame searches the moves of one node and a finished frame hands its score to its parent.
+
+    Searched positions are stored by their Zobrist hash in `board.transposition_table`,
+    a transposed position searched at least as deep is not searched again
+    and the best move found for it is tried first.
+    Then come the captures, most valuable victim first, the killer moves of the depth
+    and the quiet moves that cut off most often so far (history heuristic).
+
+    At the search depth the captures are still searched (quiescence, see `QUIESCENCE_PLIES`)
+    and interior nodes first try passing the turn (null-move pruning, see `NULL_MOVE_R`)
+    and search their late quiet moves shallower first (late-move reductions, see `LMR_R`).
+
+    With `trace` every explored board state is written to `writer`, by default
+    ./board_states.txt which `visualize_search_space.py` replays,
+    with `verbose` every explored move is printed.
+
+    The best move is translated to the Piece and Move objects of `piece_board`,
+    by default `board` itself. This lets the search run on a `Board.clone`,
+    which has no pieces, while the board on screen stays untouched.
+    A clone must therefore come with the board it was cloned from as `piece_board`.
     """
-    total_explored_states += 1
+    if piece_board is None:
+        piece_board = board
+    if piece_board.is_clone:
+        raise ValueError(
+            "A Board.clone has no pieces to translate the best move to, "
+            "pass the board it was cloned from as piece_board."
+        )
 
-    if writer is None:
+    close_writer = trace and writer is None
+    if close_writer:
         writer = open("./board_states.txt", "w", encoding="utf-8")
-        close_writer = True
-    else:
-        close_writer = False
-
-    if depth == 0 or board.game_over:
-        if board.game_over:
-            if board.winner == board.human_player:
-                score = float(-inf)
-            elif board.winner == board.bot_player:
-                score = float(inf)
-        else:
-            score = board.score_board(player)
+    trace_buf: List[str] = []
+    if killers is None:
+        killers = [[-1, -1] for _ in range(depth + 1)]
+    if history is None:
+        history = [0] * (12 * 64)
+
+    table = board.transposition_table
+    if table is None:
+        table = board.transposition_table = [None] * TT_SIZE
+
+    sign = 1 if player == board.bot_player else -1
+    if sign < 0:
+        a, b = -b, -a
 
+    total_explored_states += 1
+    score, root = _enter(board, depth, a, b, player, table, killers, history, True)
+    if root is None:
         if close_writer:
             writer.close()
 
-        return score, None, None, total_explored_states
+        return sign * score, None, None, total_explored_states
 
-    if player == board.bot_player:
-        max_score = float(-inf)
-        best_piece = None
-        best_move = None
-        for piece in board.get_pieces_for_player(player):
-            moves: List[Move] = piece.calculate_moves(board)
-            sorted_moves = sorted(moves, key=lambda x: x.score, reverse=True)
-            for move in sorted_moves:
-                new_board = board.clone()
+    # Looked up once, they run for every node.
+    make_move, undo_move = board.make_move, board.undo_move
 
-                x_start, y_start = piece.ind_pos
-                x_end, y_end = move.end_pos
+    stack: List[_Frame] = [root]
+    # The score of the child frame that just finished, None while a child is being searched.
+    result: Optional[int] = None
+    while stack:
+        frame = stack[-1]
+        moves = frame.moves
 
-                print(
-                    f"{total_explored_states}\t[{max_score}]\t->\t",
-                    f"Exploring {new_board.blocks[x_start][y_start].piece} move from {move.start_pos} to {move.end_pos}",
-                )
+        if result is not None and moves[frame.next - 1] == NULL_MOVE:
+            board.undo_null_move(frame.undo)
 
-                new_board.move(
-                    [new_board.blocks[x_start][y_start], new_board.blocks[x_end][y_end]]
-                )
-                
-                new_board_state = new_board.serialize(store=False)
-                if isinstance(new_board_state, str):
-                    writer.write(new_board_state + "\n")
-                score, _, _, total_explored_states = minimax(
-                    new_board,
-                    depth - 1,
-                    new_board.current_player,
-                    total_explored_states,
-                    a,
-                    b,
-                    writer,
-                )
+            # Passing the turn was already good enough, so a real move is too.
+            if -result >= frame.b:
+                frame.best_score = -result
+                frame.next = len(moves)
+            result = None
 
-                if score > max_score:
-                    max_score = score
-                    best_piece = piece
-                    best_move = move
-
-                a = max(a, max_score)
-                if a >= b:
-                    break
-
-        return (max_score, best_piece, best_move, total_explored_states)
-    else:
-        min_score = float(inf)
-        best_piece = None
-        best_move = None
-        for piece in board.get_pieces_for_player(player):
-            moves = piece.calculate_moves(board)
-            sorted_moves = sorted(moves, key=lambda x: x.score, reverse=True)
-            for move in sorted_moves:
-                new_board = board.clone()
-
-                x_start, y_start = piece.ind_pos
-                x_end, y_end = move.end_pos
-
-                print(
-                    f"{total_explored_states}\t[{min_score}]\t->\t",
-                    f"Exploring {new_board.blocks[x_start][y_start].piece} move from {move.start_pos} to {move.end_pos}",
+        if result is not None and frame.reduced:
+            frame.reduced = False
+            if -result > frame.a:
+                # The reduced search says the move beats alpha after all, search it fully.
+                total_explored_states += 1
+                result, child = _enter(
+                    board,
+                    frame.depth - 1,
+                    -frame.b,
+                    -frame.a,
+                    board.current_player,
+                    table,
+                    killers,
+                    history,
+                    False,
                 )
+                if child is not None:
+                    stack.append(child)
+                    continue
 
-                new_board.move(
-                    [new_board.blocks[x_start][y_start], new_board.blocks[x_end][y_end]]
-                )
+        if result is not None:
+            move = moves[frame.next - 1]
+            undo_move(frame.undo)
 
-                new_board_state = new_board.serialize(store=False)
-                if isinstance(new_board_state, str):
-                    writer.write(new_board_state + "\n")
-
-                score, _, _, total_explored_states = minimax(
-                    new_board,
-                    depth - 1,
-                    new_board.current_player,
-                    total_explored_states,
-                    a,
-                    b,
-                    writer,
-                )
+            if -result > frame.best_score:
+                frame.best_score = -result
+                frame.best_move = move
+                if frame.best_score > frame.a:
+                    frame.a = frame.best_score
+            result = None
+
+            if frame.a >= frame.b:
+                if frame.depth > 0:
+                    _store_cutoff(killers[frame.depth], history, move, frame.depth)
+                frame.next = len(moves)
+
+        if frame.next == len(moves):
+            # Every move is searched (or cut off), store the score and hand it to the parent.
+            # Quiescence frames are not stored.
+            best_score = frame.best_score
+            if frame.depth > 0:
+                if best_score <= frame.window_a:
+                    flag = UPPER
+                elif best_score >= frame.window_b:
+                    flag = LOWER
+                else:
+                    flag = EXACT
+                best_move = frame.best_move
+                best_from_to = best_move & 0xFFF if best_move is not None else -1
+                table[frame.key & TT_MASK] = (frame.key, frame.depth, best_score, flag, best_from_to)
+
+            stack.pop()
+            result = best_score
+            continue
+
+        move = moves[frame.next]
+        frame.next += 1
+
+        if move == NULL_MOVE:
+            # Search the position with the other player to move, shallower
+            # and with a null window just at the bound the frame has to beat.
+            frame.undo = board.make_null_move()
+
+            total_explored_states += 1
+            result, child = _enter(
+                board,
+                frame.depth - 1 - NULL_MOVE_R,
+                -frame.b,
+                1 - frame.b,
+                board.current_player,
+                table,
+                killers,
+                history,
+                False,
+            )
+            if child is not None:
+                stack.append(child)
+            continue
+
+        if verbose:
+            from_sq, to_sq, _, moving = decode_move(move)
+            print(
+                f"{total_explored_states}\t[{frame.best_score}]\t->\t",
+                f"Exploring {PIECES[moving]} move from {divmod(from_sq, 8)} to {divmod(to_sq, 8)}",
+            )
+
+        frame.undo = make_move(move)
+        if trace:
+            trace_buf.append(board.serialize())
+            if len(trace_buf) >= TRACE_BATCH:
+                writer.write("\n".join(trace_buf) + "\n")
+                trace_buf.clear()
+
+        total_explored_states += 1
+        if frame.next > frame.reduce_from and (move >> 12) & 0xF == NO_CAPTURE:
+            # A late quiet move, only check with a null window that it can't beat alpha.
+            frame.reduced = True
+            result, child = _enter(
+                board,
+                frame.depth - 1 - LMR_R,
+                -frame.a - 1,
+                -frame.a,
+                board.current_player,
+                table,
+                killers,
+                history,
+                False,
+            )
+        else:
+            result, child = _enter(
+                board, frame.depth - 1, -frame.b, -frame.a, board.current_player, table, killers, history, False
+            )
+        if child is not None:
+            stack.append(child)
+
+    if trace_buf:
+        writer.write("\n".join(trace_buf) + "\n")
+    if close_writer:
+        writer.close()
+
+    best_piece, best_piece_move = _to_piece_move(piece_board, root.best_move)
+
+    return sign * root.best_score, best_piece, best_piece_move, total_explored_states
+
+
+def iterative_minimax(
+    board: Board,
+    max_depth: int,
+    player: str,
+    deadline: Optional[float]=None,
+    writer: Optional[TextIO]=None,
+    trace: bool=False,
+    verbose: bool=False,
+    piece_board: Optional[Board]=None,
+) -> Tuple[int, Optional[Piece], Optional[Move], int]:
+    """
+    Iterative deepening: search depth 1, 2, ... up to `max_depth` and return the last result.
+    Every search leaves its best moves in the transposition table and its history scores,
+    so the next, deeper search tries them first and cuts off more.
+
+    Parameters
+    ----------
+    board       : Board
+        The board to search, the moves are taken back before returning.
+    max_depth   : int
+        The depth of the last search.
+    player      : str
+        The player to move.
+    deadline    : Optional[float]
+        A `time.monotonic()` time after which no deeper search is started.
+    piece_board : Optional[Board]
+        The board to translate the best move to, see `minimax`.
+
+    Returns
+    -------
+    Tuple[int, Optional[Piece], Optional[Move], int]
+        Like `minimax`, with the states explored by all the searches.
+    """
+    if max_depth < 1:
+        raise ValueError(f"Iterative deepening needs a max_depth of at least 1, got {max_depth}.")
+
+    # All the searches trace into one file.
+    close_writer = trace and writer is None
+    if close_writer:
+        writer = open("./board_states.txt", "w", encoding="utf-8")
 
-                if score < min_score:
-                    min_score = score
-                    best_piece = piece
-                    best_move = move
+    history = [0] * (12 * 64)
+    total_explored_states = 0
+    for depth in range(1, max_depth + 1):
+        score, best_piece, best_move, total_explored_states = minimax(
+            board,
+            depth,
+            player,
+            total_explored_states,
+            writer=writer,
+            trace=trace,
+            verbose=verbose,
+            history=history,
+            piece_board=piece_board,
+        )
+        if deadline is not None and monotonic() > deadline:
+            break
 
-                b = min(b, min_score)
-                if b <= a:
-                    break
+    if close_writer:
+        writer.close()
 
-        return (min_score, best_piece, best_move, total_explored_states)
+    return score, best_piece, best_move, total_explored_states
@@ -1,10 +1,10 @@
 import pygame
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Optional
-from math import inf
 
 from board import Board, Block
 from piece import Move
-from bot import minimax
+from bot import TT_SIZE, iterative_minimax
 
 if __name__ == "__main__":
     pygame.init()
@@ -15,17 +15,34 @@ if __name__ == "__main__":
     SCREEN.fill([255, 255, 255])
 
     MAX_SEARCH_PLY = 1
+    # Write the explored board states for visualize_search_space.py, slows the search down.
+    TRACE_SEARCH = False
+    # The board only changes on an event, so the loop sleeps until one arrives
+    # (or this many ms pass) and only redraws after it. Mouse motion is never used.
+    IDLE_WAIT_MS = 500
     HUMAN_PLAYER = "b"
     BOT_PLAYER = "b" if HUMAN_PLAYER == "w" else "w"
 
     board = Board(MAX_SCREEN_WIDTH, MAX_SCREEN_HEIGHT, HUMAN_PLAYER)
 
     clock = pygame.time.Clock()
+    pygame.event.set_blocked(pygame.MOUSEMOTION)
+
+    # The bot searches a clone of the board in a worker thread, so the window keeps
+    # drawing and handling events meanwhile. The worker posts BOT_MOVE_READY when done.
+    BOT_MOVE_READY = pygame.event.custom_type()
+    bot_executor = ThreadPoolExecutor(max_workers=1)
+    bot_search: Optional[Future] = None
 
     selected_block: Optional[Block] = None
+    redraw = True
     running = True
     while running:
-        for event in pygame.event.get():
+        event = pygame.event.wait(IDLE_WAIT_MS)
+        events = [] if event.type == pygame.NOEVENT else [event, *pygame.event.get()]
+        for event in events:
+            redraw = True
+
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if board.current_player == HUMAN_PLAYER:
                     selected_block = board.find_by_pos_mouse(event.pos)
@@ -33,46 +50,67 @@ if __name__ == "__main__":
                     if isinstance(selected_block, Block):
                         selected_block.select_block(board)
 
-                if board.current_player == BOT_PLAYER:
-                    score, best_piece, best_move, states_expl = minimax(
-                        board, MAX_SEARCH_PLY, BOT_PLAYER
+                if board.current_player == BOT_PLAYER and not board.game_over and bot_search is None:
+                    # Clones share the table of the board, so it lives on `board` and
+                    # every turn's search starts from what the previous ones found.
+                    if board.transposition_table is None:
+                        board.transposition_table = [None] * TT_SIZE
+                    bot_search = bot_executor.submit(
+                        iterative_minimax,
+                        board.clone(),
+                        MAX_SEARCH_PLY,
+                        BOT_PLAYER,
+                        trace=TRACE_SEARCH,
+                        piece_board=board,
                     )
+                    bot_search.add_done_callback(
+                        lambda _: pygame.event.post(pygame.event.Event(BOT_MOVE_READY))
+                    )
+
+            if event.type == BOT_MOVE_READY:
+                score, best_piece, best_move, states_expl = bot_search.result()
+                bot_search = None
 
-                    if score != abs(float(inf)) and isinstance(best_move, Move):
-                        print("=" * 100)
-                        print(
-                            f"[{score}]\t->\t",
-                            f"Chosen {best_piece} move from {best_move.start_pos} to {best_move.end_pos}",
+                if isinstance(best_move, Move):
+                    print("=" * 100)
+                    print(
+                        f"[{score}]\t->\t",
+                        f"Chosen {best_piece} move from {best_move.start_pos} to {best_move.end_pos}",
+                    )
+                    print("=" * 100)
+                    print(f"Explored {states_expl} states.")
+                    if best_move:
+                        x_start, y_start = best_move.start_pos
+                        x_end, y_end = best_move.end_pos
+                        start_block, end_block = (
+                            board.blocks[x_start][y_start],
+                            board.blocks[x_end][y_end],
                         )
-                        print("=" * 100)
-                        print(f"Explored {states_expl} states.")
-                        if best_move:
-                            x_start, y_start = best_move.start_pos
-                            x_end, y_end = best_move.end_pos
-                            start_block, end_block = (
-                                board.blocks[x_start][y_start],
-                                board.blocks[x_end][y_end],
-                            )
-
-                            board.move([start_block, end_block])
-
-            if event.type == pygame.KEYDOWN:
+
+                        board.move([start_block, end_block], [best_move])
+
+            # The board can't change under a running search.
+            if event.type == pygame.KEYDOWN and bot_search is None:
                 if event.key == pygame.K_LEFT:
                     board.load_prev_state()
 
-            if event.type == pygame.KEYDOWN:
+            if event.type == pygame.KEYDOWN and bot_search is None:
                 if event.key == pygame.K_r:
                     board = Board(MAX_SCREEN_WIDTH, MAX_SCREEN_HEIGHT, HUMAN_PLAYER)
 
             if event.type == pygame.QUIT:
                 running = False
 
-        SCREEN.fill((255, 255, 255))
+        if redraw:
+            redraw = False
+
+            SCREEN.fill((255, 255, 255))
 
-        board.update(SCREEN)
+            board.update(SCREEN)
 
-        pygame.display.flip()
+            pygame.display.flip()
 
-        clock.tick(60)
+            clock.tick(60)
 
+    bot_executor.shutdown()
     pygame.quit()
@@ -1,11 +1,14 @@
 from __future__ import annotations
 from pathlib import Path
 
-from typing import List, Tuple, Optional, TYPE_CHECKING
+from typing import Dict, List, Tuple, Optional, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from src.board import Board
 
+# Image paths that were already found on disk, keyed by (team, name).
+_IMG_PATHS: Dict[Tuple[str, str], Path] = {}
+
 
 class Move:
     """
@@ -17,7 +20,7 @@ class Move:
         Starting position of the move.
     end_pos : Tuple[int, int]
         Ending position of the move.
-    score : float
+    score : int
         Heuristic score associated with the move.
     is_capture : bool
         Whether the move captures an opponent's piece.
@@ -25,12 +28,15 @@ class Move:
         The captured piece, if any.
     """
 
+    # Every move list of the UI builds a batch of these, no need for a __dict__ each.
+    __slots__ = ("piece", "start_pos", "end_pos", "score", "is_capture", "captured_piece")
+
     def __init__(
         self,
         piece: Piece,
         start_pos: Tuple[int, int],
         end_pos: Tuple[int, int],
-        score: float,
+        score: int,
         is_capture: bool,
         captured_piece: Optional[Piece] = None,
     ):
@@ -42,18 +48,6 @@ class Move:
         self.is_capture = is_capture
         self.captured_piece = captured_piece
 
-    def __lt__(self, other: "Move") -> Optional[bool]:
-        """
-        Compare Moves based on their score.
-
-        Parameters
-        ----------
-        other   : Move
-
-        """
-
-        return self.score < other.score
-
     def __str__(self):
         """
         Method to represent a Move in human-readable form.
@@ -82,7 +76,7 @@ class MoveFactory:
         piece: Piece,
         start_pos: Tuple[int, int],
         end_pos: Tuple[int, int],
-        score: float,
+        score: int,
         is_capture: bool,
         captured_piece: Optional[Piece],
     ):
@@ -93,7 +87,7 @@ class MoveFactory:
             Starting position of the move.
         end_pos : Tuple[int, int]
             Ending position of the move.
-        score : float
+        score : int
             Heuristic score associated with the move.
         is_capture : bool
             Whether the move captures an opponent's piece.
@@ -105,22 +99,14 @@ class MoveFactory:
         Move
             A Move object.
         """
-        self.move = Move(
-            piece=piece,
-            start_pos=start_pos,
-            end_pos=end_pos,
-            score=score,
-            is_capture=is_capture,
-            captured_piece=captured_piece,
-        )
-
         assert 0 <= start_pos[0] < 8, f"Piece position for x axis is out of bounds"
         assert 0 <= start_pos[1] < 8, f"Piece position for y axis is out of bounds"
 
         assert 0 <= end_pos[0] < 8, f"Piece position for x axis is out of bounds"
         assert 0 <= end_pos[1] < 8, f"Piece position for y axis is out of bounds"
 
-        return self.move
+        # The factory doesn't keep the move, it would hold on to the last piece it saw.
+        return Move(piece, start_pos, end_pos, score, is_capture, captured_piece)
 
 
 class Piece:
@@ -141,42 +127,24 @@ class Piece:
         self.ind_pos = ind_pos
         self.team = team
 
-        self.img_path = Path(f"chess_symbols/{team}_{name}.svg")
-        assert self.img_path.exists(), f"The provided image file is not found."
+        # Only the first piece of a kind pays for the filesystem check.
+        self.img_path = _IMG_PATHS.get((team, name))
+        if self.img_path is None:
+            self.img_path = Path(f"chess_symbols/{team}_{name}.svg")
+            assert self.img_path.exists(), f"The provided image file is not found."
+            _IMG_PATHS[(team, name)] = self.img_path
 
-        self.m_factory = MoveFactory()
+        # The board version `available_moves` was calculated for.
+        self._moves_version: Optional[int] = None
 
     def __repr__(self):
         return f"Piece {self.team}-{self.name} at position {self.ind_pos}"
 
-    def _check_position_bounds(self, pos: Tuple[int, int]) -> Optional[Tuple[int, int]]:
-        """
-        Method to validate a Piece's position and ensure that it's inside the 8x8 grid.
-        The difference with the `can_move` method is that this will check only if the
-        desired position is inside the 8x8 grid whereas `can_move` checks if the desired
-        position is held by another piece.
-
-        Parameters
-        ----------
-        pos     : Tuple[int, int]
-            The position we are interested in.
-
-        Returns
-        -------
-        Optional[Tuple[int, int]]
-            If desired position is inside the 8x8 grid, then we return the position
-            else we return None.
-
-        """
-        in_bounds = pos
-        if pos[0] < 0 or pos[0] > 7 or pos[1] < 0 or pos[1] > 7:
-            in_bounds = None
-
-        return in_bounds
-
     def calculate_moves(self, board: Board) -> List[Move]:
         """
         Method to calculate all possible moves for a piece.
+        The moves come from the board's bitboards and attack tables (`Board.calculate_moves_for`)
+        and are kept until the board changes.
 
         Parameters
         ----------
@@ -185,404 +153,14 @@ class Piece:
 
         Returns
         -------
-        List[Tuple[int, int]]
+        List[Move]
             A list of all possible moves for a given piece.
         """
-        self.available_moves: List[Move] = []
-
-        if board.current_player == self.team:
-            match self.name:
-                case "king":
-                    start_pos = self.ind_pos
-                    # directions=[forward, backward, left, right, forward diagonal right, forward diagonal left, backward diagonal right, backward diagonal left]
-                    directions = [
-                        (0, -1),
-                        (0, 1),
-                        (-1, 0),
-                        (1, 0),
-                        (1, 1),
-                        (1, -1),
-                        (-1, 1),
-                        (-1, -1),
-                    ]
-                    for dir in directions:
-                        end_pos = self._check_position_bounds(
-                            (start_pos[0] + dir[0], start_pos[1] + dir[1])
-                        )
-
-                        if not end_pos:
-                            continue
-
-                        unknown_piece = board.find_by_pos(end_pos)
-
-                        # There are 3 states a board cell can be in.
-                        # 1. empty  2. Occupied by same team    3. Occupied by enemy team
-                        if (
-                            end_pos
-                            and unknown_piece
-                            and self.team != unknown_piece.team
-                        ):
-
-                            # Cell is occupied by enemy team, capture is registered as a valid move
-                            self.available_moves.append(
-                                self.m_factory(
-                                    piece=self,
-                                    start_pos=start_pos,
-                                    end_pos=end_pos,
-                                    score=10000.0,
-                                    is_capture=True,
-                                    captured_piece=unknown_piece,
-                                )
-                            )
-
-                        elif not unknown_piece:
-                            # Cell is unoccupied, move
-                            self.available_moves.append(
-                                self.m_factory(
-                                    piece=self,
-                                    start_pos=start_pos,
-                                    end_pos=end_pos,
-                                    score=1000.0,
-                                    is_capture=False,
-                                    captured_piece=None,
-                                )
-                            )
-                        if (
-                            end_pos
-                            and unknown_piece
-                            and self.team == unknown_piece.team
-                        ):
-                            # Cell occupied by same team, check next move
-                            continue
-
-                case "queen":
-                    start_pos = self.ind_pos
-
-                    # directions=[forward, backward, left, right, left_forward, right_forward, left_backward, right_backward]
-                    directions = [
-                        (0, 1),
-                        (0, -1),
-                        (-1, 0),
-                        (1, 0),
-                        (-1, -1),
-                        (1, 1),
-                        (-1, 1),
-                        (1, -1),
-                    ]
-                    for dir in directions:
-                        for i in range(1, 8):
-                            end_pos = self._check_position_bounds(
-                                (start_pos[0] + i * dir[0], start_pos[1] + i * dir[1])
-                            )
-
-                            if not end_pos:
-                                continue
-
-                            unknown_piece = board.find_by_pos(
-                                end_pos,
-                            )
-                            # There are 3 states a board cell can be in.
-                            # 1. empty  2. Occupied by same team    3. Occupied by enemy team
-                            if (
-                                end_pos
-                                and unknown_piece
-                                and self.team != unknown_piece.team
-                            ):
-                                # Cell is occupied by enemy team, capture is registered as a valid move
-                                self.available_moves.append(
-                                    self.m_factory(
-                                        piece=self,
-                                        start_pos=start_pos,
-                                        end_pos=end_pos,
-                                        score=600.0,
-                                        is_capture=True,
-                                        captured_piece=unknown_piece,
-                                    )
-                                )
-                                break
-
-                            elif not unknown_piece:
-                                # Cell is unoccupied, move
-                                self.available_moves.append(
-                                    self.m_factory(
-                                        piece=self,
-                                        start_pos=start_pos,
-                                        end_pos=end_pos,
-                                        score=300.0,
-                                        is_capture=False,
-                                        captured_piece=None,
-                                    )
-                                )
-                            if (
-                                end_pos
-                                and unknown_piece
-                                and self.team == unknown_piece.team
-                            ):
-                                # Cell occupied by same team, check next move
-                                break
-
-                case "rook":
-                    start_pos = self.ind_pos
-
-                    # directions=[forward, backward, left, right]
-                    directions = [(0, -1), (0, 1), (-1, 0), (1, 0)]
-                    for dir in directions:
-                        for i in range(1, 8):
-                            end_pos = self._check_position_bounds(
-                                (start_pos[0] + i * dir[0], start_pos[1] + i * dir[1])
-                            )
-
-                            if not end_pos:
-                                continue
-
-                            unknown_piece = board.find_by_pos(end_pos)
-                            # There are 3 states a board cell can be in.
-                            # 1. empty  2. Occupied by same team    3. Occupied by enemy team
-                            if (
-                                end_pos
-                                and unknown_piece
-                                and self.team != unknown_piece.team
-                            ):
-                                # Cell is occupied by enemy team, capture is registered as a valid move
-                                self.available_moves.append(
-                                    self.m_factory(
-                                        piece=self,
-                                        start_pos=start_pos,
-                                        end_pos=end_pos,
-                                        score=200.0,
-                                        is_capture=True,
-                                        captured_piece=unknown_piece,
-                                    )
-                                )
-                                break
-
-                            elif not unknown_piece:
-                                # Cell is unoccupied, move
-                                self.available_moves.append(
-                                    self.m_factory(
-                                        piece=self,
-                                        start_pos=start_pos,
-                                        end_pos=end_pos,
-                                        score=100.0,
-                                        is_capture=False,
-                                        captured_piece=None,
-                                    )
-                                )
-
-                            if (
-                                end_pos
-                                and unknown_piece
-                                and self.team == unknown_piece.team
-                            ):
-                                # Cell occupied by same team, check next move
-                                break
-
-                case "bishop":
-                    start_pos = self.ind_pos
-
-                    # directions=[left_forward, right_forward, left_backward, right_backward]
-                    directions = [(1, -1), (1, 1), (-1, -1), (-1, 1)]
-                    for dir in directions:
-                        for i in range(1, 8):
-                            end_pos = self._check_position_bounds(
-                                (start_pos[0] + i * dir[0], start_pos[1] + i * dir[1])
-                            )
-
-                            if not end_pos:
-                                continue
-
-                            unknown_piece = board.find_by_pos(end_pos)
-                            # There are 3 states a board cell can be in.
-                            # 1. empty  2. Occupied by same team    3. Occupied by enemy team
-                            if (
-                                end_pos
-                                and unknown_piece
-                                and self.team != unknown_piece.team
-                            ):
-                                # Cell is occupied by enemy team, capture is registered as a valid move
-                                self.available_moves.append(
-                                    self.m_factory(
-                                        piece=self,
-                                        start_pos=start_pos,
-                                        end_pos=end_pos,
-                                        score=100.0,
-                                        is_capture=True,
-                                        captured_piece=unknown_piece,
-                                    )
-                                )
-                                break
-
-                            elif not unknown_piece:
-                                # Cell is unoccupied, move
-                                self.available_moves.append(
-                                    self.m_factory(
-                                        piece=self,
-                                        start_pos=start_pos,
-                                        end_pos=end_pos,
-                                        score=50.0,
-                                        is_capture=False,
-                                        captured_piece=None,
-                                    )
-                                )
-
-                            if (
-                                end_pos
-                                and unknown_piece
-                                and self.team == unknown_piece.team
-                            ):
-                                # Cell occupied by same team, check next move
-                                break
-
-                case "knight":
-                    start_pos = self.ind_pos
-
-                    directions = [
-                        (1, 2),
-                        (1, -2),
-                        (-1, 2),
-                        (-1, -2),
-                        (2, 1),
-                        (2, -1),
-                        (-2, 1),
-                        (-2, -1),
-                    ]
-                    for dir in directions:
-                        end_pos = self._check_position_bounds(
-                            (start_pos[0] + dir[0], start_pos[1] + dir[1])
-                        )
-
-                        if not end_pos:
-                            continue
-
-                        unknown_piece = board.find_by_pos(end_pos)
-                        # There are 3 states a board cell can be in.
-                        # 1. empty  2. Occupied by same team    3. Occupied by enemy team
-                        if (
-                            end_pos
-                            and unknown_piece
-                            and self.team != unknown_piece.team
-                        ):
-                            # Cell is occupied by enemy team, capture is registered as a valid move
-                            self.available_moves.append(
-                                self.m_factory(
-                                    piece=self,
-                                    start_pos=start_pos,
-                                    end_pos=end_pos,
-                                    score=100.0,
-                                    is_capture=True,
-                                    captured_piece=unknown_piece,
-                                )
-                            )
-
-                        elif not unknown_piece:
-                            # Cell is unoccupied, move
-                            self.available_moves.append(
-                                self.m_factory(
-                                    piece=self,
-                                    start_pos=start_pos,
-                                    end_pos=end_pos,
-                                    score=0.0,
-                                    is_capture=False,
-                                    captured_piece=None,
-                                )
-                            )
-
-                        if (
-                            end_pos
-                            and unknown_piece
-                            and self.team == unknown_piece.team
-                        ):
-                            # Cell occupied by same team, check next move
-                            continue
-
-                case "pawn":
-                    start_pos = self.ind_pos
-
-                    home_pos = (
-                        2
-                        if (start_pos[1] == 1 and self.team == "w")
-                        or (start_pos[1] == 6 and self.team == "b")
-                        else 1
-                    )
-                    pawn_dir = 1 if self.team == "w" else -1
-
-                    # directions=[forward, forward_right, forward_left]
-                    directions = [(0, pawn_dir), (1, pawn_dir), (-1, pawn_dir)]
-                    if home_pos == 2:
-                        directions.append((0, pawn_dir * 2))
-
-                    for dir in directions:
-                        end_pos = self._check_position_bounds(
-                            (start_pos[0] + dir[0], start_pos[1] + dir[1])
-                        )
-
-                        if not end_pos:
-                            continue
-
-                        # REMINDME: Put condition for reaching final rank and promoting
-                        unknown_piece = board.find_by_pos(end_pos)
-
-                        # There are 3 states a board cell can be in.
-                        # 1. empty  2. Occupied by same team    3. Occupied by enemy team
-                        if (
-                            end_pos
-                            and unknown_piece
-                            and self.team != unknown_piece.team
-                            and dir[0] != 0
-                        ):
-                            # print(dir, self, unknown_piece)
-
-                            # print(self, f"Capturing {unknown_piece}")
-                            # Cell is occupied by enemy team, capture is registered as a valid move
-                            self.available_moves.append(
-                                self.m_factory(
-                                    piece=self,
-                                    start_pos=start_pos,
-                                    end_pos=end_pos,
-                                    score=20.0,
-                                    is_capture=True,
-                                    captured_piece=unknown_piece,
-                                )
-                            )
-
-                        elif not unknown_piece and dir[0] == 0:
-
-                            inter_piece = board.find_by_pos(
-                                (end_pos[0], end_pos[1] * pawn_dir)
-                            )
-                            if inter_piece:
-                                # For the 2 step move originating from home,
-                                # check if there is a piece 1 step ahead before moving.
-                                break
-                            else:
-                                # Cell is unoccupied, move
-                                self.available_moves.append(
-                                    self.m_factory(
-                                        piece=self,
-                                        start_pos=start_pos,
-                                        end_pos=end_pos,
-                                        score=0.0,
-                                        is_capture=False,
-                                        captured_piece=None,
-                                    )
-                                )
-
-                        if (
-                            end_pos
-                            and unknown_piece
-                            and self.team == unknown_piece.team
-                            and dir[0] == 0
-                        ):
-                            # Cell occupied by same team, discard move
-
-                            # FIXME: THIS IS BAD :)
-                            if (0, pawn_dir * 2) in directions:
-                                directions.remove((0, pawn_dir * 2))
-                            continue
-                case _:
-                    raise NotImplementedError("Wrong piece to get moves!") 
-
-        self.available_moves = list(set(self.available_moves))
+        if self._moves_version == board._version:
+            return self.available_moves
+
+        self.available_moves: List[Move] = board.calculate_moves_for(self)
+        self._moves_version = board._version
 
         return self.available_moves
 
@@ -16,12 +16,16 @@ if __name__ == "__main__":
 
     SCREEN.fill([255, 255, 255])
 
+    # The board only changes on a key press, so the loop sleeps until an event arrives
+    # (or this many ms pass) and only redraws after it. Mouse motion is never used.
+    IDLE_WAIT_MS = 500
     HUMAN_PLAYER = "b"
     BOT_PLAYER = "b" if HUMAN_PLAYER == "w" else "w"
 
     BOARD = Board(MAX_SCREEN_WIDTH, MAX_SCREEN_HEIGHT, HUMAN_PLAYER)
 
     clock = pygame.time.Clock()
+    pygame.event.set_blocked(pygame.MOUSEMOTION)
 
     time_idx = 0
     state = boards_history[time_idx]
@@ -34,9 +38,13 @@ if __name__ == "__main__":
             print("States are identical!")
             break
 
+    redraw = True
     running = True
     while running:
-        for event in pygame.event.get():
+        event = pygame.event.wait(IDLE_WAIT_MS)
+        events = [] if event.type == pygame.NOEVENT else [event, *pygame.event.get()]
+        for event in events:
+            redraw = True
 
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_LEFT:
@@ -72,12 +80,15 @@ if __name__ == "__main__":
             if event.type == pygame.QUIT:
                 running = False
 
-        SCREEN.fill((255, 255, 255))
+        if redraw:
+            redraw = False
 
-        BOARD.update(SCREEN)
+            SCREEN.fill((255, 255, 255))
 
-        pygame.display.flip()
+            BOARD.update(SCREEN)
 
-        clock.tick(60)
+            pygame.display.flip()
+
+            clock.tick(60)
 
     pygame.quit()
@@ -0,0 +1,137 @@
+import unittest
+import copy
+
+from src.board import *
+from src.bot import minimax
+
+
+class TestBoardState(unittest.TestCase):
+
+    def setUp(self):
+        self.board = Board(1400, 900, "b")
+
+    def test_bitboards_match_pieces(self):
+        # Every piece sits on exactly one bit of its own bitboard
+        self.assertEqual(self.board.occ.bit_count(), len(self.board.pieces))
+        for piece in self.board.pieces:
+            self.assertIs(self.board.find_by_pos(piece.ind_pos), piece)
+            self.assertEqual(
+                self.board.piece_index(piece.ind_pos), PIECE_IDX[(piece.team, piece.name)]
+            )
+
+        self.assertIsNone(self.board.find_by_pos((4, 4)))
+
+    def test_make_undo_move(self):
+        bb, player, zhash = list(self.board.bb), self.board.current_player, self.board.zhash
+
+        undo_stack = []
+        for _ in range(6):
+            move = max(self.board.generate_moves())
+            undo_stack.append(self.board.make_move(move))
+
+        self.assertNotEqual(self.board.bb, bb)
+        self.assertEqual(
+            self.board.zhash, zobrist_hash(self.board.bb, self.board.current_player)
+        )
+        self.assertEqual(self.board.material_balance, material(self.board.bb))
+
+        while undo_stack:
+            self.board.undo_move(undo_stack.pop())
+
+        self.assertEqual(self.board.bb, bb)
+        self.assertEqual(self.board.current_player, player)
+        self.assertEqual(self.board.zhash, zhash)
+
+    def test_load_prev_state_undoes_move(self):
+        # Human plays black and moves first
+        pawn = self.board.find_by_pos((3, 6))
+        blocks = [self.board.blocks[3][6], self.board.blocks[3][4]]
+        self.board.move(blocks)
+
+        self.assertEqual(pawn.ind_pos, (3, 4))
+        self.assertEqual(len(self.board.move_history), 1)
+
+        self.board.load_prev_state()
+
+        self.assertEqual(pawn.ind_pos, (3, 6))
+        self.assertIs(self.board.find_by_pos((3, 6)), pawn)
+        self.assertIsNone(self.board.find_by_pos((3, 4)))
+        self.assertEqual(self.board.current_player, "b")
+
+    def test_load_prev_state_from_string(self):
+        self.board.move([self.board.blocks[3][6], self.board.blocks[3][4]])
+        state, bb = self.board.serialize(), list(self.board.bb)
+
+        board = Board(1400, 900, "b")
+        board.load_prev_state(state)
+
+        self.assertEqual(board.bb, bb)
+        self.assertEqual(len(board.pieces), 32)
+        for piece in board.pieces:
+            self.assertIs(board.find_by_pos(piece.ind_pos), piece)
+
+    def test_deepcopy_is_playable_clone_is_not(self):
+        board = copy.deepcopy(self.board)
+        board.move([board.blocks[3][6], board.blocks[3][4]])
+        self.assertIsNotNone(board.find_by_pos((3, 4)))
+        self.assertIsNone(self.board.find_by_pos((3, 4)))
+
+        with self.assertRaises(NotImplementedError):
+            self.board.clone().find_by_pos((3, 6))
+
+    def test_mouse_finds_block_with_odd_block_size(self):
+        # 1407 // 7 = 201, so the blocks don't sit on a whole pixel grid
+        board = Board(1407, 1407, "b")
+        for row in board.blocks:
+            for block in row:
+                rect = block.pg_rect
+                self.assertIs(board.find_by_pos_mouse(rect.topleft), block)
+                self.assertIs(board.find_by_pos_mouse((rect.right - 1, rect.bottom - 1)), block)
+
+    def test_blocked_pawn_cannot_double_push(self):
+        # A white bishop right in front of the black pawn blocks both pushes
+        self.board.load_prev_state("WK30Wb75BK47BP76")
+        pawn = self.board.find_by_pos((7, 6))
+        self.assertEqual(pawn.calculate_moves(self.board), [])
+
+    def test_pawn_on_last_row_cannot_move(self):
+        # A push from (7, 7) would shift past bit 63 and wrap around to (0, 0)
+        board = Board(1400, 900, "w")
+        board.load_prev_state("WK30WP77BK47")
+        pawn_moves = [move for move in board.generate_moves() if (move >> 16) & 0xF == PAWN]
+        self.assertEqual(pawn_moves, [])
+
+    def test_mobility_skips_pawn_on_last_row(self):
+        # Only the 5 king squares count, the stuck pawn adds nothing
+        self.board.load_prev_state("WK30WP77BK47")
+        self.assertEqual(mobility(self.board.bb, 0, self.board.occ_w, self.board.occ_b), 5)
+
+    def test_search_clone_plays_on_piece_board(self):
+        clone = self.board.clone()
+        with self.assertRaises(ValueError):
+            minimax(clone, 2, self.board.current_player)
+
+        bb = list(self.board.bb)
+        _, piece, move, _ = minimax(clone, 2, self.board.current_player, piece_board=self.board)
+
+        # The move belongs to the board on screen, which the search left untouched
+        self.assertIs(self.board.find_by_pos(move.start_pos), piece)
+        self.assertEqual(clone.bb, bb)
+        self.assertEqual(self.board.bb, bb)
+
+    def test_king_capture_ends_game(self):
+        # Black moves first and its queen takes the white king
+        self.board.load_prev_state("WK30BQ31BK47")
+        self.assertFalse(self.board.game_over)
+
+        self.board.move([self.board.blocks[3][1], self.board.blocks[3][0]])
+        self.assertTrue(self.board.game_over)
+        self.assertEqual(self.board.winner, "b")
+
+        self.board.load_prev_state()
+        self.assertFalse(self.board.game_over)
+        self.assertIsNone(self.board.winner)
+
+
+if __name__ == "__main__":
+    unittest.main()